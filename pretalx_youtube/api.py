@@ -1,14 +1,36 @@
-import csv
+import datetime as dt
+import hashlib
 
-from rest_framework import parsers, serializers, status, viewsets
+from django.conf import settings
+from django.db.models import Count, F, Max
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.utils.timezone import now
+from django_scopes import scopes_disabled
+from rest_framework import pagination, parsers, serializers, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from pretalx.api.permissions import ApiPermission, PluginPermission
+from pretalx.person.rules import is_only_reviewer
 from pretalx.submission.models import Submission
 
-from .models import YouTubeLink
-from .utils import VIDEO_ID_RE
+from .exporter import iter_csv, iter_export_rows, iter_ndjson
+from .importer import (
+    ImportFormatError,
+    ImportValidationError,
+    import_links,
+    iter_csv_rows,
+    iter_json_rows,
+)
+from .instrumentation import add_rows, instrumented
+from .models import YouTubeLink, YouTubeLinkDeletion
+from .throttling import ImportThrottle
+from .utils import normalise_video_ids
 
 
 class YouTubeLinkSerializer(serializers.ModelSerializer):
@@ -34,6 +56,9 @@ class YouTubeLinkSerializer(serializers.ModelSerializer):
 
 
 class YouTubeLinkWriteSerializer(YouTubeLinkSerializer):
+    # Any YouTube URL is accepted, so the length is checked after normalising.
+    video_id = serializers.CharField()
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if not getattr(self, "event", None):
@@ -47,13 +72,10 @@ class YouTubeLinkWriteSerializer(YouTubeLinkSerializer):
             self.fields["submission"].queryset = self.event.submissions.all()
 
     def validate_video_id(self, value):
-        # Strip out any URL parts
-        if "/" in value:
-            parts = [p for p in value.split("/") if p]
-            value = parts[-1]
-        if value and not VIDEO_ID_RE.match(value):
-            raise serializers.ValidationError("This is not a valid YouTube video id.")
-        return value
+        (video_id,), errors = normalise_video_ids([value])
+        if errors:
+            raise serializers.ValidationError(errors[0])
+        return video_id
 
     def save(self, **kwargs):
         if not self.instance:
@@ -69,6 +91,39 @@ class YouTubeLinkWriteSerializer(YouTubeLinkSerializer):
         fields = ["submission", "video_id"]
 
 
+# Writes are visible only once their transaction commits, but their ``updated``
+# time is taken before that. ``synced_at`` lags behind by this much, so that the
+# next sync sees links changed in transactions that were still running.
+CHANGES_OVERLAP = dt.timedelta(minutes=5)
+
+
+class YouTubeLinkChangesQuerySerializer(serializers.Serializer):
+    changed_since = serializers.DateTimeField()
+
+
+class YouTubeLinkCursorPagination(pagination.CursorPagination):
+    """Keyset pagination by submission code.
+
+    Unlike page numbers, this needs no count query and no OFFSET, so deep
+    pages are as cheap as the first one.
+    """
+
+    ordering = "submission_code"
+    page_size_query_param = "page_size"
+    max_page_size = settings.MAX_PAGINATION_LIMIT
+
+    def get_ordering(self, request, queryset, view):
+        # The annotation below is the only ordering we can page by, so
+        # ordering parameters like ``?o=`` are ignored.
+        return (self.ordering,)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Cursor pagination only supports orderings on the model itself.
+        queryset = queryset.annotate(submission_code=F("submission__code"))
+        return super().paginate_queryset(queryset, request, view=view)
+
+
+@method_decorator(instrumented("api"), name="dispatch")
 class YouTubeLinkViewSet(viewsets.ModelViewSet):
     serializer_class = YouTubeLinkSerializer
     queryset = YouTubeLink.objects.none()
@@ -77,7 +132,30 @@ class YouTubeLinkViewSet(viewsets.ModelViewSet):
     read_permission_required = "schedule.list_schedule"
     write_permission_required = "event.update_event"
     lookup_field = "submission__code"
-    permission_map = {"bulk_import": "event.update_event"}
+    permission_map = {
+        "bulk_import": "event.update_event",
+        "changes": "schedule.list_schedule",
+    }
+
+    @property
+    def paginator(self):
+        if (
+            not hasattr(self, "_paginator")
+            and self.request.query_params.get("pagination") == "cursor"
+        ):
+            self._paginator = YouTubeLinkCursorPagination()
+        return super().paginator
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            add_rows(len(page))
+        return page
+
+    def get_throttles(self):
+        if self.action == "bulk_import":
+            return [ImportThrottle()]
+        return super().get_throttles()
 
     def get_serializer_class(self):
         if self.action in ("create", "update", "partial_update"):
@@ -89,7 +167,7 @@ class YouTubeLinkViewSet(viewsets.ModelViewSet):
         if not event:
             return YouTubeLink.objects.none()
         return (
-            YouTubeLink.objects.filter(submission__event=event)
+            YouTubeLink.objects.filter(event=event)
             .select_related("submission")
             .order_by("submission__code")
         )
@@ -97,45 +175,194 @@ class YouTubeLinkViewSet(viewsets.ModelViewSet):
     def get_permission_object(self):
         return self.request.event
 
+    def get_conditional_headers(self):
+        """Return the ETag and Last-Modified timestamp for a read request.
+
+        Both are derived from a per-event change marker: the number of links,
+        the time the latest one was changed and the time the latest one was
+        deleted. Every write changes one of them. The ETag also covers the URL
+        (for pagination and the like) and the requested format.
+        """
+        marker = YouTubeLink.objects.filter(event=self.request.event).aggregate(
+            count=Count("pk"), updated=Max("updated")
+        )
+        deleted = YouTubeLinkDeletion.objects.filter(
+            event=self.request.event
+        ).aggregate(deleted=Max("deleted"))["deleted"]
+        changed = max(filter(None, (marker["updated"], deleted)), default=None)
+        last_modified = int(changed.timestamp()) if changed else None
+        key = "|".join(
+            str(value)
+            for value in (
+                self.request.event.pk,
+                marker["count"],
+                changed and changed.isoformat(),
+                self.request.get_full_path(),
+                self.request.headers.get("Accept", ""),
+            )
+        )
+        return quote_etag(hashlib.sha256(key.encode()).hexdigest()), last_modified
+
+    def conditional(self, handler, request, *args, **kwargs):
+        """Answer with 304 if the client's copy is current, else call ``handler``."""
+        etag, last_modified = self.get_conditional_headers()
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
     def perform_create(self, serializer):
-        serializer.save()
+        serializer.save(event=self.request.event)
 
     def perform_update(self, serializer):
         serializer.save()
 
+    @action(detail=False, methods=["get"])
+    def changes(self, request, *args, **kwargs):
+        """List the links changed and deleted since ``?changed_since=``.
+
+        Clients pass the ``synced_at`` value of the previous response as the
+        next ``changed_since``. As ``synced_at`` lags behind by
+        ``CHANGES_OVERLAP``, recent changes are listed again in the next
+        response, so clients need to apply them idempotently.
+        """
+        query = YouTubeLinkChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        since = query.validated_data["changed_since"]
+        synced_at = now() - CHANGES_OVERLAP
+        links = (
+            self.get_queryset()
+            .filter(updated__gt=since)
+            .order_by("updated", "submission__code")
+        )
+        # A link that was deleted and then added again counts as changed.
+        deleted = (
+            YouTubeLinkDeletion.objects.filter(event=request.event, deleted__gt=since)
+            .exclude(
+                submission_code__in=YouTubeLink.objects.filter(
+                    event=request.event
+                ).values("submission__code")
+            )
+            .order_by("submission_code")
+            .values_list("submission_code", flat=True)
+            .distinct()
+        )
+        return Response(
+            {
+                "changed": self.get_serializer(links, many=True).data,
+                "deleted": list(deleted),
+                "synced_at": synced_at,
+            }
+        )
+
     @action(detail=False, methods=["post"], url_path="import", url_name="import")
     def bulk_import(self, request, *args, **kwargs):
-        data = None
-        if request.content_type == "application/json":
-            data = request.data
-        if not data:
+        # We read the data straight from the request stream / uploaded file
+        # and hand it to the importer in batches, instead of loading the whole
+        # upload into memory first.
+        is_json = request.content_type.startswith("application/json")
+        if is_json:
+            source = request.stream
+        else:
             # Parse uploaded file. We're generous and doing this even when
             # the content type is not set correctly.
             parser = parsers.FileUploadParser()
             data = parser.parse(request, parser_context={"request": request})
-        if not data:
+            files = getattr(data, "files", data)
+            # There needs to be exactly one file, and it's not a JSON file,
+            # so let's hope it's CSV!
+            source = next(iter(files.values())) if files and len(files) == 1 else None
+        if not source:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        if not isinstance(data, list):
-            # The parser has found a single file and returned a single object, as it wasn't
-            # a JSON file. Let's hope it's CSV!
-            if len(data) > 1:
-                return Response(status=status.HTTP_400_BAD_REQUEST)
-            try:
-                data = [
-                    line
-                    for line in csv.DictReader(next(iter(data.values())).splitlines())
-                    if any(line.values())
-                ]
-            except Exception:  # noqa: BLE001
-                return Response(status=status.HTTP_400_BAD_REQUEST)
-
+        rows = iter_json_rows(source) if is_json else iter_csv_rows(source)
+        dry_run = request.query_params.get("dry_run", "").lower() in ("1", "true")
         # We aren't using many=True because making sure that we are always
-        # running get_or_create() is not trivial with many=True
-        for row in data:
-            serializer = YouTubeLinkWriteSerializer(
-                data=row, context={"request": request}
+        # upserting is not trivial with many=True, and because validating and
+        # writing row by row costs several queries per row.
+        try:
+            created, updated = import_links(request.event, rows, dry_run=dry_run)
+        except ImportFormatError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ImportValidationError as e:
+            return Response(e.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {"created": created, "updated": updated},
+            status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED,
+        )
+
+
+class YouTubeLinkExportView(APIView):
+    """Streams the YouTube links of all of an organiser's events.
+
+    Only events that have the plugin enabled and whose links the user (and
+    token) may list are included. Use ``?output=csv`` for CSV instead of
+    newline-delimited JSON.
+    """
+
+    # Checks the token's endpoint permissions as on the per-event endpoint,
+    # and that the user belongs to the organiser. Each event is checked again
+    # in get_events.
+    permission_classes = [IsAuthenticated & ApiPermission]
+    permission_map = {"list": "event.view_organiser"}
+    action = "list"
+    detail = False
+    output_formats = {
+        "ndjson": ("application/x-ndjson", iter_ndjson),
+        "csv": ("text/csv", iter_csv),
+    }
+
+    def get_events(self):
+        request = self.request
+        events = request.organiser.events.all()
+        if request.auth:
+            events = events.filter(pk__in=request.auth.events.all())
+        permission = YouTubeLink.get_perm("list")
+        return [
+            event
+            for event in events
+            if "pretalx_youtube" in event.plugin_list
+            and request.user.has_perm(permission, event)
+            and not (request.auth and self.is_hidden_from_reviewer(event))
+        ]
+
+    def is_hidden_from_reviewer(self, event):
+        """Whether the user may not use the API for this event as a reviewer.
+
+        Mirrors ApiPermission: reviewers only get API access during a review
+        phase in which they can see speaker names.
+        """
+        phase = event.active_review_phase
+        return is_only_reviewer(self.request.user, event) and (
+            not phase or not phase.can_see_speaker_names
+        )
+
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get("output", "ndjson")
+        if output not in self.output_formats:
+            return Response(
+                {"detail": f"Unknown output format: {output}"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-        return Response(status=status.HTTP_201_CREATED)
+        with scopes_disabled():
+            events = self.get_events()
+        content_type, render = self.output_formats[output]
+        response = StreamingHttpResponse(
+            render(iter_export_rows(events)), content_type=content_type
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{request.organiser.slug}-youtube.{output}"'
+        )
+        return response
@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.db import transaction
+
+# The cached data is dropped whenever it changes, so this only bounds how long
+# entries for deleted or inactive events linger.
+RECORDINGS_CACHE_TIMEOUT = 24 * 60 * 60
+MANIFEST_CACHE_TIMEOUT = RECORDINGS_CACHE_TIMEOUT
+# Talk guids are dropped when a schedule is released. The timeout bounds how
+# long talks added in between take to show up.
+SUBMISSION_GUIDS_CACHE_TIMEOUT = 60 * 60
+# Webhook settings are dropped whenever they change.
+WEBHOOK_SETTINGS_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def recordings_cache_key(event_id):
+    return f"pretalx_youtube:recordings:{event_id}"
+
+
+def recordings_version_key(event_id):
+    return f"pretalx_youtube:recordings_version:{event_id}"
+
+
+def recording_cache_key(event_id, version, submission_id):
+    return f"pretalx_youtube:recording:{event_id}:{version}:{submission_id}"
+
+
+def manifest_cache_key(event_id):
+    return f"pretalx_youtube:manifest:{event_id}"
+
+
+def invalidate_recordings(event_id):
+    """Drop the cached recordings and recording manifest of an event.
+
+    Dropping the version makes all per-submission entries stale at once.
+    Call this after writing links without ``YouTubeLink.save()`` or
+    ``.delete()``, e.g. with ``bulk_create`` or queryset methods.
+    """
+    keys = [
+        recordings_cache_key(event_id),
+        recordings_version_key(event_id),
+        manifest_cache_key(event_id),
+    ]
+    cache.delete_many(keys)
+    # A request may have cached the old data again before we commit.
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_manifest(event_id):
+    cache.delete(manifest_cache_key(event_id))
+
+
+def submission_guids_version_key(event_id):
+    return f"pretalx_youtube:submission_guids_version:{event_id}"
+
+
+def submission_guid_cache_key(event_id, version, guid):
+    return f"pretalx_youtube:submission_guid:{event_id}:{version}:{guid}"
+
+
+def invalidate_submission_guids(event_id):
+    cache.delete(submission_guids_version_key(event_id))
+
+
+def webhook_settings_cache_key(event_id):
+    return f"pretalx_youtube:webhook_settings:{event_id}"
+
+
+def invalidate_webhook_settings(event_id):
+    key = webhook_settings_cache_key(event_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
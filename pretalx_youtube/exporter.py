@@ -0,0 +1,92 @@
+import csv
+import json
+
+from django_scopes import scope
+
+from .forms import get_scheduled_talks
+from .models import YouTubeLink
+
+EXPORT_FIELDS = ["event", "submission", "video_id", "youtube_link"]
+# Imports ignore all but the first two columns, so exports can be imported again.
+EVENT_EXPORT_FIELDS = ["submission", "video_id", "title", "room", "start"]
+# Rows are fetched from the database in chunks of this size while streaming.
+CHUNK_SIZE = 2000
+
+
+def iter_export_rows(events):
+    """Yield one dict per YouTube link of the given events.
+
+    Uses a single query, ordered by event and submission code, whose rows are
+    fetched in chunks as the output is consumed.
+    """
+    links = (
+        YouTubeLink.objects.filter(event__in=events)
+        .order_by("event__slug", "submission__code")
+        .values_list("event__slug", "submission__code", "video_id")
+    )
+    for event, submission, video_id in links.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            "event": event,
+            "submission": submission,
+            "video_id": video_id,
+            "youtube_link": YouTubeLink(video_id=video_id).youtube_link,
+        }
+
+
+def iter_event_export_rows(event):
+    """Yield one dict per scheduled talk of ``event`` that has a YouTube link.
+
+    Like ``iter_export_rows``, this runs a single query and fetches its rows
+    in chunks as the output is consumed.
+    """
+    tz = event.tz
+    # Streaming responses are consumed after the view has returned, so we need
+    # our own scope.
+    with scope(event=event):
+        talks = get_scheduled_talks(event).filter(
+            submission__youtube_link__isnull=False
+        )
+        for submission, video_id, title, room, start in talks.values_list(
+            "submission__code",
+            "submission__youtube_link__video_id",
+            "submission__title",
+            "room__name",
+            "start",
+        ).iterator(chunk_size=CHUNK_SIZE):
+            yield {
+                "submission": submission,
+                "video_id": video_id,
+                "title": title,
+                "room": str(room) if room is not None else "",
+                "start": start.astimezone(tz).isoformat() if start else "",
+            }
+
+
+def iter_ndjson(rows):
+    """Render rows as newline-delimited JSON, one line at a time."""
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+def iter_json(rows):
+    """Render rows as a JSON array, one element at a time."""
+    separator = "[\n"
+    for row in rows:
+        yield separator + json.dumps(row)
+        separator = ",\n"
+    yield "[]\n" if separator == "[\n" else "\n]\n"
+
+
+class _Echo:
+    """A file-like object that hands back what is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, fields=EXPORT_FIELDS):
+    """Render rows as CSV with a header row, one line at a time."""
+    writer = csv.DictWriter(_Echo(), fieldnames=fields)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
@@ -1,11 +1,16 @@
 import copy
+import datetime as dt
 
 from django import forms
+from django.db import transaction
+from django.utils.formats import date_format
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 
 from pretalx.common.forms.renderers import InlineFormRenderer
 
-from .models import YouTubeLink
+from .cache import invalidate_recordings
+from .models import YouTubeLink, YouTubeLinkDeletion
 from .utils import extract_video_id
 
 
@@ -15,26 +20,83 @@ class FileUploadForm(forms.Form):
     file = forms.FileField(label=_("File"))
 
 
-class YouTubeUrlForm(forms.Form):
+def get_scheduled_talks(event):
+    return (
+        event.current_schedule.talks.all()
+        .filter(is_visible=True, submission__isnull=False)
+        .select_related("submission")
+        .order_by("start", "pk")
+    )
+
+
+class YouTubeFilterForm(forms.Form):
+    default_renderer = InlineFormRenderer
+
+    room = forms.ModelChoiceField(
+        queryset=None, required=False, empty_label=_("All rooms")
+    )
+    day = forms.ChoiceField(required=False)
+    track = forms.ModelChoiceField(
+        queryset=None, required=False, empty_label=_("All tracks")
+    )
+    missing = forms.BooleanField(
+        required=False, label=_("Only sessions without a video")
+    )
+
     def __init__(self, *args, event, **kwargs):
         super().__init__(*args, **kwargs)
+        self.fields["room"].queryset = event.rooms.all()
+        self.fields["track"].queryset = event.tracks.all()
+        days = (
+            event.date_from + dt.timedelta(days=offset)
+            for offset in range((event.date_to - event.date_from).days + 1)
+        )
+        self.fields["day"].choices = [("", _("All days"))] + [
+            (day.isoformat(), date_format(day, "SHORT_DATE_FORMAT")) for day in days
+        ]
+
+    def filter_talks(self, talks):
+        if room := self.cleaned_data.get("room"):
+            talks = talks.filter(room=room)
+        if day := self.cleaned_data.get("day"):
+            talks = talks.filter(start__date=dt.date.fromisoformat(day))
+        if track := self.cleaned_data.get("track"):
+            talks = talks.filter(submission__track=track)
+        if self.cleaned_data.get("missing"):
+            talks = talks.filter(submission__youtube_link__isnull=True)
+        return talks
+
+
+class YouTubeUrlForm(forms.Form):
+    def __init__(self, *args, event, talks=None, **kwargs):
+        """Builds one field per talk in ``talks`` (all scheduled talks by default).
+
+        Only these talks are validated and saved, so large schedules can be
+        edited page by page.
+        """
+        super().__init__(*args, **kwargs)
+        self.event = event
 
         if not event or not event.current_schedule:
             return
 
-        self.talks = (
-            event.current_schedule.talks.all()
-            .filter(is_visible=True, submission__isnull=False)
-            .order_by("start")
-        )
-        youtube_data = {
-            v.submission.code: v.youtube_link
-            for v in YouTubeLink.objects.filter(submission__event=event)
+        # Two queries in total, however many talks there are.
+        if talks is None:
+            talks = get_scheduled_talks(event)
+        self.talks = list(talks)
+        self.links = {
+            link.submission_id: link
+            for link in YouTubeLink.objects.filter(
+                submission_id__in=[talk.submission_id for talk in self.talks]
+            )
         }
         s = _("Go to video.")
         p = _("Go to talk page.")
         for talk in self.talks:
-            link = youtube_data.get(talk.submission.code)
+            # The talk page URL needs the event, which we already have.
+            talk.submission.event = event
+            link = self.links.get(talk.submission_id)
+            link = link.youtube_link if link else None
             help_text = f'<a href="{talk.submission.urls.public.full()}" target="_blank">{p}</a>'
             if link:
                 help_text += f' | <a href="{link}" target="_blank">{s}</a>'
@@ -61,11 +123,44 @@ class YouTubeUrlForm(forms.Form):
         return result
 
     def save(self):
+        """Write only the links that changed, with one query per kind of change.
+
+        Talks whose field was not submitted at all are left alone, only empty
+        fields delete links.
+        """
+        to_create = {}
+        to_update = {}
+        to_delete = {}
         for talk in self.talks:
-            video_id = self.cleaned_data.get(f"video_id_{talk.submission.code}")
-            if video_id:
-                YouTubeLink.objects.update_or_create(
-                    submission=talk.submission, defaults={"video_id": video_id}
+            name = f"video_id_{talk.submission.code}"
+            if self.add_prefix(name) not in self.data:
+                continue
+            video_id = self.cleaned_data.get(name)
+            link = self.links.get(talk.submission_id)
+            if not video_id:
+                if link:
+                    to_delete[link.pk] = talk.submission.code
+            elif not link:
+                to_create[talk.submission_id] = YouTubeLink(
+                    submission=talk.submission, event=self.event, video_id=video_id
                 )
-            else:
-                YouTubeLink.objects.filter(submission=talk.submission).delete()
+            elif link.video_id != video_id:
+                link.video_id = video_id
+                link.updated = now()
+                to_update[link.pk] = link
+
+        with transaction.atomic():
+            if to_create:
+                YouTubeLink.objects.bulk_create(to_create.values())
+            if to_update:
+                YouTubeLink.objects.bulk_update(
+                    to_update.values(), fields=["video_id", "updated"]
+                )
+            if to_delete:
+                YouTubeLink.objects.filter(pk__in=to_delete).delete()
+                YouTubeLinkDeletion.objects.bulk_create(
+                    YouTubeLinkDeletion(event=self.event, submission_code=code)
+                    for code in to_delete.values()
+                )
+            if to_create or to_update or to_delete:
+                invalidate_recordings(self.event.pk)
@@ -0,0 +1,320 @@
+import codecs
+import csv
+import json
+import re
+from itertools import islice
+
+from django.db import transaction
+from django.utils.timezone import now
+from rest_framework import serializers
+
+from .cache import invalidate_recordings
+from .instrumentation import add_rows
+from .models import YouTubeLink
+from .utils import normalise_video_ids
+
+# Uploads are read in chunks of this many bytes, and handed to the writer in
+# batches of this many rows, so that memory use does not grow with file size.
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 500
+# No sensible import row comes anywhere close to this size.
+MAX_JSON_ROW_LENGTH = 64 * 1024
+JSON_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+# Characters that may continue a JSON number
+JSON_NUMBER_TAIL_RE = re.compile(r"[0-9+\-.eE]*")
+
+
+class ImportFormatError(ValueError):
+    """The uploaded data is not a readable CSV file or JSON array."""
+
+
+class ImportValidationError(ValueError):
+    """One or more import rows are invalid.
+
+    ``errors`` is a list of ``{"row": …, "line": …, "errors": {…}}`` dicts,
+    one per invalid row, with the row's position in the file (counting from 1),
+    the line it was found on and its serializer errors.
+    """
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _iter_text(source):
+    """Yield decoded text from a string, bytes or a file-like object."""
+    if isinstance(source, str | bytes):
+        chunks = [source]
+    else:
+        chunks = iter(lambda: source.read(CHUNK_SIZE), b"")
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    try:
+        for chunk in chunks:
+            if not chunk:
+                # read() returns "" at EOF on text-mode files
+                break
+            text = chunk if isinstance(chunk, str) else decoder.decode(chunk)
+            if text:
+                yield text
+        if text := decoder.decode(b"", final=True):
+            yield text
+    except UnicodeDecodeError as e:
+        raise ImportFormatError("The file is not UTF-8 encoded.") from e
+
+
+def _iter_lines(source):
+    pending = ""
+    for text in _iter_text(source):
+        lines = (pending + text).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
+
+
+def iter_csv_rows(source):
+    """Yield ``(line, row)`` for each row of a CSV file with a header row.
+
+    ``row`` is a dict, and ``line`` the line number the row ends on.
+    """
+    reader = csv.DictReader(_iter_lines(source))
+    try:
+        for row in reader:
+            if any(row.values()):
+                yield reader.line_num, row
+    except csv.Error as e:
+        raise ImportFormatError(str(e)) from e
+
+
+def iter_json_rows(source):
+    """Yield ``(line, element)`` for each element of a top-level JSON array.
+
+    ``line`` is the line number the element starts on. Only the element
+    currently being decoded (plus at most one chunk) is held in memory, so
+    arbitrarily large arrays can be read at a flat cost.
+    """
+    decoder = json.JSONDecoder()
+    chunks = _iter_text(source)
+    buffer = ""
+    position = 0
+    exhausted = False
+    state = "start"
+    # The line number at buffer[counted]
+    line = 1
+    counted = 0
+
+    def read_more():
+        nonlocal buffer, position, exhausted, line, counted
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+        line += buffer.count("\n", counted, position)
+        counted = 0
+        buffer = buffer[position:] + (chunk or "")
+        position = 0
+
+    while True:
+        position = JSON_WHITESPACE_RE.match(buffer, position).end()
+        if position == len(buffer):
+            if exhausted:
+                break
+            read_more()
+            continue
+        char = buffer[position]
+        if state == "start":
+            if char != "[":
+                raise ImportFormatError("Expected a JSON array.")
+            position += 1
+            state = "first"
+        elif state == "separator":
+            if char not in ",]":
+                raise ImportFormatError("Expected ',' or ']'.")
+            position += 1
+            state = "value" if char == "," else "end"
+        elif state == "first" and char == "]":
+            position += 1
+            state = "end"
+        elif state in ("first", "value"):
+            try:
+                row, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if exhausted or len(buffer) - position > MAX_JSON_ROW_LENGTH:
+                    raise ImportFormatError(str(e)) from e
+                read_more()
+                continue
+            if (
+                not exhausted
+                and isinstance(row, (int, float))
+                and JSON_NUMBER_TAIL_RE.fullmatch(buffer, end)
+                and len(buffer) - position <= MAX_JSON_ROW_LENGTH
+            ):
+                # A number cut off by the end of the buffer decodes to a
+                # shorter one (``1e`` is read as ``1``), so wait for the rest.
+                read_more()
+                continue
+            line += buffer.count("\n", counted, position)
+            counted = position
+            position = end
+            state = "separator"
+            yield line, row
+        else:
+            raise ImportFormatError("Unexpected data after the JSON array.")
+    if state != "end":
+        raise ImportFormatError("Unexpected end of the JSON array.")
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class YouTubeLinkImportSerializer(serializers.Serializer):
+    """Describes an import row, used for rows that are not plain strings.
+
+    Video ids are normalised per batch in ``import_links``.
+    """
+
+    submission = serializers.CharField()
+    video_id = serializers.CharField()
+
+
+def _read_row(row):
+    """Return the stripped ``(submission, video_id)`` of a row, or raise.
+
+    Rows with two non-empty strings, i.e. nearly all of them, are read
+    directly, as running a serializer for each row would take most of the
+    import's time. ``serializers.ValidationError`` is raised with the
+    serializer's errors for all other rows.
+    """
+    if isinstance(row, dict):
+        submission = row.get("submission")
+        video_id = row.get("video_id")
+        if isinstance(submission, str) and isinstance(video_id, str):
+            submission = submission.strip()
+            video_id = video_id.strip()
+            if submission and video_id:
+                return submission, video_id
+    serializer = YouTubeLinkImportSerializer(data=row)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    return data["submission"], data["video_id"]
+
+
+def write_links(video_ids):
+    """Upsert ``{submission: video_id}`` with a constant number of queries.
+
+    Each submission's ``event_id`` is copied to its new link, as
+    ``bulk_create`` skips ``YouTubeLink.save()``.
+
+    Returns a ``(created, updated)`` tuple of counts.
+    """
+    existing = {
+        link.submission_id: link
+        for link in YouTubeLink.objects.filter(submission__in=video_ids.keys())
+    }
+    to_create = []
+    to_update = []
+    for submission, video_id in video_ids.items():
+        link = existing.get(submission.pk)
+        if not link:
+            to_create.append(
+                YouTubeLink(
+                    submission=submission,
+                    event_id=submission.event_id,
+                    video_id=video_id,
+                )
+            )
+        elif link.video_id != video_id:
+            link.video_id = video_id
+            link.updated = now()
+            to_update.append(link)
+    YouTubeLink.objects.bulk_create(to_create)
+    YouTubeLink.objects.bulk_update(to_update, fields=["video_id", "updated"])
+    return len(to_create), len(to_update)
+
+
+def import_links(event, rows, *, dry_run=False, batch_size=BATCH_SIZE):
+    """Create or update the YouTube links for ``event`` from ``(line, row)`` pairs.
+
+    Rows are consumed in batches of ``batch_size``, so ``rows`` can be one of
+    the streaming readers above. Per batch, submission codes are resolved in a
+    single query, existing links are loaded in a single query, and changes are
+    written with ``bulk_create``/``bulk_update``. Like ``POST`` on the API,
+    importing always upserts: if a submission appears more than once, the last
+    row wins.
+
+    The import is all-or-nothing: it runs in one transaction, and raises an
+    ``ImportValidationError`` listing every invalid row if there are any, in
+    which case nothing is written. ``ImportFormatError`` from the readers is
+    passed on, also rolling back. With ``dry_run``, the import is validated
+    and rolled back even if it succeeds.
+    Returns a ``(created, updated)`` tuple of counts.
+    """
+    errors = []
+    created = updated = 0
+    with transaction.atomic():
+        numbered_rows = enumerate(rows, start=1)
+        for batch in _batched(numbered_rows, batch_size):
+            read = []
+            for position, (line, row) in batch:
+                try:
+                    read.append((position, line, *_read_row(row)))
+                except serializers.ValidationError as e:
+                    errors.append({"row": position, "line": line, "errors": e.detail})
+
+            normalised, video_id_errors = normalise_video_ids(
+                [video_id for _position, _line, _code, video_id in read]
+            )
+            validated = []
+            for index, (position, line, code, _video_id) in enumerate(read):
+                if index in video_id_errors:
+                    errors.append(
+                        {
+                            "row": position,
+                            "line": line,
+                            "errors": {"video_id": [video_id_errors[index]]},
+                        }
+                    )
+                else:
+                    validated.append((position, line, code, normalised[index]))
+
+            codes = {code for _position, _line, code, _video_id in validated}
+            submissions = {
+                submission.code: submission
+                for submission in event.submissions.filter(code__in=codes)
+            }
+            video_ids = {}
+            for position, line, code, video_id in validated:
+                submission = submissions.get(code)
+                if not submission:
+                    message = serializers.SlugRelatedField.default_error_messages[
+                        "does_not_exist"
+                    ].format(slug_name="code", value=code)
+                    errors.append(
+                        {
+                            "row": position,
+                            "line": line,
+                            "errors": {"submission": [message]},
+                        }
+                    )
+                    continue
+                video_ids[submission] = video_id
+
+            # Once a row has failed, we keep validating to report every
+            # error, but there is no point in writing anything anymore.
+            if not errors:
+                batch_created, batch_updated = write_links(video_ids)
+                created += batch_created
+                updated += batch_updated
+
+        if errors:
+            errors.sort(key=lambda error: error["row"])
+            raise ImportValidationError(errors)
+        if dry_run:
+            transaction.set_rollback(True)
+        elif created or updated:
+            invalidate_recordings(event.pk)
+    add_rows(created + updated)
+    return created, updated
@@ -0,0 +1,147 @@
+import contextvars
+import functools
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+TRUE_VALUES = ("1", "on", "true", "yes")
+_current = contextvars.ContextVar("pretalx_youtube_measurement", default=None)
+
+
+@functools.cache
+def get_config():
+    """Return ``(enabled, metrics)`` from the plugin settings.
+
+    Cached, so that entry points don't pay for more than this call when
+    instrumentation is off.
+    """
+    config = settings.PLUGIN_SETTINGS.get("pretalx_youtube", {})
+    enabled = config.get("instrumentation", "").lower() in TRUE_VALUES
+    prometheus = config.get("prometheus", "").lower() in TRUE_VALUES
+    return enabled, get_metrics() if enabled and prometheus else None
+
+
+@receiver(setting_changed)
+def reset_config(setting, **kwargs):
+    if setting == "PLUGIN_SETTINGS":
+        get_config.cache_clear()
+
+
+@functools.cache
+def get_metrics():
+    """Create the Prometheus metrics, once per process."""
+    try:
+        import prometheus_client  # noqa: PLC0415
+    except ImportError:
+        logger.warning("prometheus_client is not installed, not recording metrics.")
+        return None
+    labels = ["entry_point"]
+    return {
+        "duration": prometheus_client.Histogram(
+            "pretalx_youtube_duration_seconds", "Time spent per call.", labels
+        ),
+        "queries": prometheus_client.Histogram(
+            "pretalx_youtube_db_queries",
+            "Database queries per call.",
+            labels,
+            buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+        ),
+        "query_duration": prometheus_client.Histogram(
+            "pretalx_youtube_db_duration_seconds",
+            "Time spent on database queries per call.",
+            labels,
+        ),
+        "rows": prometheus_client.Counter(
+            "pretalx_youtube_rows", "Rows handled by each entry point.", labels
+        ),
+    }
+
+
+class Measurement:
+    """Collects the statistics of one call, and counts its queries."""
+
+    def __init__(self, entry_point):
+        self.entry_point = entry_point
+        self.queries = 0
+        self.query_duration = 0.0
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_duration += time.perf_counter() - start
+
+
+@contextmanager
+def measure(entry_point):
+    """Record the statistics of the enclosed code under ``entry_point``.
+
+    Yields the ``Measurement``, or None if instrumentation is off.
+    """
+    enabled, metrics = get_config()
+    if not enabled:
+        yield None
+        return
+    measurement = Measurement(entry_point)
+    token = _current.set(measurement)
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(measurement):
+            yield measurement
+    finally:
+        duration = time.perf_counter() - start
+        _current.reset(token)
+        logger.info(
+            "%s took %.1f ms, %d queries (%.1f ms), %d rows",
+            entry_point,
+            duration * 1000,
+            measurement.queries,
+            measurement.query_duration * 1000,
+            measurement.rows,
+            extra={
+                "entry_point": entry_point,
+                "duration_ms": duration * 1000,
+                "db_queries": measurement.queries,
+                "db_duration_ms": measurement.query_duration * 1000,
+                "rows": measurement.rows,
+            },
+        )
+        if metrics:
+            metrics["duration"].labels(entry_point).observe(duration)
+            metrics["queries"].labels(entry_point).observe(measurement.queries)
+            metrics["query_duration"].labels(entry_point).observe(
+                measurement.query_duration
+            )
+            metrics["rows"].labels(entry_point).inc(measurement.rows)
+
+
+def instrumented(entry_point):
+    """Decorate a function to record its statistics under ``entry_point``."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not get_config()[0]:
+                return function(*args, **kwargs)
+            with measure(entry_point):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def add_rows(count):
+    """Add ``count`` to the rows handled by the current entry point, if any."""
+    if measurement := _current.get():
+        measurement.rows += count
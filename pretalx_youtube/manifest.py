@@ -0,0 +1,45 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+
+from .cache import MANIFEST_CACHE_TIMEOUT, manifest_cache_key
+from .forms import get_scheduled_talks
+from .models import YouTubeLink
+
+
+def build_manifest(event):
+    """Return the recordings of an event's scheduled talks as JSON bytes.
+
+    Maps each submission code to its video id, embed URL and watch URL.
+    """
+    recordings = {}
+    if event.current_schedule:
+        talks = get_scheduled_talks(event).filter(
+            submission__youtube_link__isnull=False
+        )
+        for code, video_id in talks.order_by("submission__code").values_list(
+            "submission__code", "submission__youtube_link__video_id"
+        ):
+            link = YouTubeLink(video_id=video_id)
+            recordings[code] = {
+                "video_id": video_id,
+                "embed_url": link.player_link,
+                "watch_url": link.youtube_link,
+            }
+    return json.dumps(recordings, sort_keys=True).encode()
+
+
+def get_manifest(event):
+    """Return the ``(content, digest)`` of an event's manifest.
+
+    The manifest is cached until the event's links change or a schedule is
+    released, and the digest changes whenever its content does.
+    """
+    key = manifest_cache_key(event.pk)
+    manifest = cache.get(key)
+    if manifest is None:
+        content = build_manifest(event)
+        manifest = (content, hashlib.sha256(content).hexdigest()[:16])
+        cache.set(key, manifest, MANIFEST_CACHE_TIMEOUT)
+    return manifest
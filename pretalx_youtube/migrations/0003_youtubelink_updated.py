@@ -0,0 +1,17 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [("pretalx_youtube", "0002_youtubewebhooksettings")]
+
+    operations = [
+        migrations.AddField(
+            model_name="youtubelink",
+            name="updated",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        )
+    ]
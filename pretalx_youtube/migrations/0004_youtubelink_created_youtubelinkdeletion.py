@@ -0,0 +1,42 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("event", "0001_initial"),
+        ("pretalx_youtube", "0003_youtubelink_updated"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="youtubelink",
+            name="created",
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name="YouTubeLinkDeletion",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False
+                    ),
+                ),
+                ("submission_code", models.CharField(max_length=16)),
+                ("deleted", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="youtube_link_deletions",
+                        to="event.event",
+                    ),
+                ),
+            ],
+        ),
+    ]
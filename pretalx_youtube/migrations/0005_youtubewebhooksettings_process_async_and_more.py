@@ -0,0 +1,51 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("event", "0001_initial"),
+        ("submission", "0062_cfp_settings_data"),
+        ("pretalx_youtube", "0004_youtubelink_created_youtubelinkdeletion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="youtubewebhooksettings",
+            name="process_async",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name="YouTubeWebhookDelivery",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False
+                    ),
+                ),
+                ("payload", models.JSONField()),
+                ("video_id", models.CharField(max_length=20)),
+                ("received", models.DateTimeField(auto_now_add=True)),
+                ("processed", models.DateTimeField(blank=True, null=True)),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="youtube_webhook_deliveries",
+                        to="event.event",
+                    ),
+                ),
+                (
+                    "submission",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="submission.submission",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,60 @@
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def backfill_deliveries(apps, schema_editor):
+    YouTubeWebhookDelivery = apps.get_model("pretalx_youtube", "YouTubeWebhookDelivery")
+    seen = set()
+    for delivery in YouTubeWebhookDelivery.objects.order_by("pk").iterator():
+        data = json.dumps(delivery.payload, sort_keys=True, separators=(",", ":"))
+        delivery.payload_hash = hashlib.sha256(data.encode()).hexdigest()
+        if (delivery.event_id, delivery.payload_hash) in seen:
+            # Duplicates are what the new constraint is about, keep the first.
+            delivery.delete()
+            continue
+        seen.add((delivery.event_id, delivery.payload_hash))
+        if not delivery.processed:
+            delivery.status = "pending"
+        elif delivery.submission_id:
+            delivery.status = "applied"
+        else:
+            delivery.status = "unmatched"
+        delivery.save(update_fields=["payload_hash", "status"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pretalx_youtube", "0005_youtubewebhooksettings_process_async_and_more")
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="youtubewebhookdelivery",
+            name="payload_hash",
+            field=models.CharField(default="", max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="youtubewebhookdelivery",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("applied", "Applied"),
+                    ("unmatched", "Unmatched"),
+                ],
+                default="pending",
+                max_length=10,
+            ),
+        ),
+        migrations.RunPython(backfill_deliveries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="youtubewebhookdelivery",
+            constraint=models.UniqueConstraint(
+                fields=("event", "payload_hash"),
+                name="unique_youtube_webhook_delivery_payload",
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_tokens(apps, schema_editor):
+    YouTubeWebhookSettings = apps.get_model("pretalx_youtube", "YouTubeWebhookSettings")
+    for settings in YouTubeWebhookSettings.objects.all():
+        settings.token_hash = hashlib.sha256(settings.token.encode()).hexdigest()
+        settings.save(update_fields=["token_hash"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pretalx_youtube", "0006_youtubewebhookdelivery_payload_hash_and_status")
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="youtubewebhooksettings",
+            name="token_hash",
+            field=models.CharField(default="", max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(hash_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(model_name="youtubewebhooksettings", name="token"),
+    ]
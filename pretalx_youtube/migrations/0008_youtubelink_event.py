@@ -0,0 +1,38 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_events(apps, schema_editor):
+    YouTubeLink = apps.get_model("pretalx_youtube", "YouTubeLink")
+    Submission = apps.get_model("submission", "Submission")
+    YouTubeLink.objects.filter(event__isnull=True).update(
+        event_id=Subquery(
+            Submission.objects.filter(pk=OuterRef("submission_id")).values("event_id")[
+                :1
+            ]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("event", "0001_initial"),
+        ("submission", "0062_cfp_settings_data"),
+        ("pretalx_youtube", "0007_youtubewebhooksettings_token_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="youtubelink",
+            name="event",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="youtube_links",
+                to="event.event",
+            ),
+        ),
+        migrations.RunPython(copy_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separate from 0008, as PostgreSQL can't alter a table in the same
+    # transaction that updated its rows.
+    dependencies = [("pretalx_youtube", "0008_youtubelink_event")]
+
+    operations = [
+        migrations.AlterField(
+            model_name="youtubelink",
+            name="event",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="youtube_links",
+                to="event.event",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="youtubelink",
+            index=models.Index(
+                fields=["event", "submission"], name="pretalx_youtube_event_sub_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="youtubelink",
+            index=models.Index(
+                fields=["event", "updated"], name="pretalx_youtube_event_upd_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,13 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [("pretalx_youtube", "0009_youtubelink_event_indexes")]
+
+    operations = [
+        migrations.AddField(
+            model_name="youtubewebhookdelivery",
+            name="queued",
+            field=models.DateTimeField(blank=True, null=True),
+        )
+    ]
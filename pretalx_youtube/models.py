@@ -1,12 +1,18 @@
+import datetime as dt
+import hashlib
+import json
 import secrets
 
 from django.db import models
 from django.utils.html import format_html
+from django.utils.timezone import now
 from rules.contrib.models import RulesModelBase, RulesModelMixin
 
 from pretalx.agenda.rules import can_view_schedule
 from pretalx.event.rules import can_change_event_settings
 
+from .cache import invalidate_recordings, invalidate_webhook_settings
+
 
 class YouTubeLink(RulesModelMixin, models.Model, metaclass=RulesModelBase):
     submission = models.OneToOneField(
@@ -14,7 +20,18 @@ class YouTubeLink(RulesModelMixin, models.Model, metaclass=RulesModelBase):
         on_delete=models.CASCADE,
         related_name="youtube_link",
     )
+    # Copied from the submission, so that event-scoped queries don't need to
+    # join the submissions table. The indexes below start with the event.
+    event = models.ForeignKey(
+        to="event.Event",
+        on_delete=models.CASCADE,
+        related_name="youtube_links",
+        db_index=False,
+    )
     video_id = models.CharField(max_length=20)
+    created = models.DateTimeField(auto_now_add=True)
+    # Bulk updates don't set this automatically, so set it when using them.
+    updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         rules_permissions = {
@@ -23,13 +40,32 @@ class YouTubeLink(RulesModelMixin, models.Model, metaclass=RulesModelBase):
             "create": can_change_event_settings,
             "update": can_change_event_settings,
         }
+        indexes = [
+            models.Index(
+                fields=["event", "submission"], name="pretalx_youtube_event_sub_idx"
+            ),
+            models.Index(
+                fields=["event", "updated"], name="pretalx_youtube_event_upd_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"YouTubeLink({self.video_id})"
 
-    @property
-    def event(self):
-        return self.submission.event
+    def save(self, *args, **kwargs):
+        if not self.event_id:
+            self.event_id = self.submission.event_id
+        super().save(*args, **kwargs)
+        invalidate_recordings(self.event_id)
+
+    def delete(self, *args, **kwargs):
+        event_id = self.event_id
+        result = super().delete(*args, **kwargs)
+        YouTubeLinkDeletion.objects.create(
+            event_id=event_id, submission_code=self.submission.code
+        )
+        invalidate_recordings(event_id)
+        return result
 
     @property
     def player_link(self):
@@ -47,17 +83,143 @@ class YouTubeLink(RulesModelMixin, models.Model, metaclass=RulesModelBase):
         )
 
 
+class YouTubeLinkDeletion(models.Model):
+    """Records that a submission's YouTube link was removed.
+
+    Lets API clients that sync incrementally find out about deletions. Like
+    ``YouTubeLink.updated``, this is only written by ``YouTubeLink.delete()``,
+    so bulk deletes have to create these themselves.
+    """
+
+    event = models.ForeignKey(
+        to="event.Event",
+        on_delete=models.CASCADE,
+        related_name="youtube_link_deletions",
+    )
+    submission_code = models.CharField(max_length=16)
+    deleted = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"YouTubeLinkDeletion({self.submission_code})"
+
+
 def generate_webhook_token():
     return secrets.token_urlsafe(32)
 
 
+def hash_webhook_token(token):
+    # Tokens are long and random, so a plain hash is enough to protect them.
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
 class YouTubeWebhookSettings(models.Model):
     event = models.OneToOneField(
         to="event.Event",
         on_delete=models.CASCADE,
         related_name="youtube_webhook_settings",
     )
-    token = models.CharField(max_length=128, default=generate_webhook_token)
+    # Only the hash is stored. The plaintext token is available as ``token``
+    # on the instance that generated it, so that it can be shown once.
+    token_hash = models.CharField(max_length=64)
+    # Store notifications and apply them in a background task.
+    process_async = models.BooleanField(default=False)
 
     def __str__(self):
         return f"YouTubeWebhookSettings(event={self.event.slug})"
+
+    def save(self, *args, **kwargs):
+        if not self.token_hash:
+            self.set_token()
+        super().save(*args, **kwargs)
+        invalidate_webhook_settings(self.event_id)
+
+    def delete(self, *args, **kwargs):
+        event_id = self.event_id
+        result = super().delete(*args, **kwargs)
+        invalidate_webhook_settings(event_id)
+        return result
+
+    def set_token(self, token=None):
+        """Replace the token with ``token`` or a new random one, and return it."""
+        self.token = token or generate_webhook_token()
+        self.token_hash = hash_webhook_token(self.token)
+        return self.token
+
+
+class YouTubeWebhookDelivery(models.Model):
+    """A webhook notification we received, and what became of it.
+
+    Notifications are identified by the hash of their payload, so that
+    repeated deliveries of the same notification are recognised.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        APPLIED = "applied"
+        UNMATCHED = "unmatched"
+
+    event = models.ForeignKey(
+        to="event.Event",
+        on_delete=models.CASCADE,
+        related_name="youtube_webhook_deliveries",
+    )
+    payload = models.JSONField()
+    payload_hash = models.CharField(max_length=64)
+    video_id = models.CharField(max_length=20)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    received = models.DateTimeField(auto_now_add=True)
+    # When the delivery was last handed to a background task
+    queued = models.DateTimeField(null=True, blank=True)
+    processed = models.DateTimeField(null=True, blank=True)
+    submission = models.ForeignKey(
+        to="submission.Submission",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "payload_hash"],
+                name="unique_youtube_webhook_delivery_payload",
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f"YouTubeWebhookDelivery(event={self.event_id}, video_id={self.video_id})"
+        )
+
+    # Pending deliveries that have not been processed after this long were
+    # most likely lost by the task queue.
+    PENDING_GRACE_PERIOD = dt.timedelta(minutes=10)
+
+    @classmethod
+    def retry_filter(cls):
+        """Return a ``Q`` for the deliveries that should be processed again.
+
+        These are unmatched deliveries, which may match now, and stale pending
+        deliveries.
+        """
+        return models.Q(status=cls.Status.UNMATCHED) | models.Q(
+            models.Q(queued__isnull=True)
+            | models.Q(queued__lt=now() - cls.PENDING_GRACE_PERIOD),
+            status=cls.Status.PENDING,
+        )
+
+    @property
+    def needs_retry(self):
+        if self.status == self.Status.UNMATCHED:
+            return True
+        return self.status == self.Status.PENDING and (
+            not self.queued or self.queued < now() - self.PENDING_GRACE_PERIOD
+        )
+
+    @staticmethod
+    def hash_payload(payload):
+        data = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(data.encode()).hexdigest()
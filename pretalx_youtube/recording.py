@@ -1,11 +1,93 @@
+import uuid
+
+from django.core.cache import cache
+
 from pretalx.agenda.recording import BaseRecordingProvider
 
+from .cache import (
+    RECORDINGS_CACHE_TIMEOUT,
+    recording_cache_key,
+    recordings_cache_key,
+    recordings_version_key,
+)
+from .instrumentation import add_rows, instrumented
+from .models import YouTubeLink
+
+CSP_HEADER = "https://www.youtube-nocookie.com/"
+
+
+def _render(link):
+    return {"iframe": link.iframe, "csp_header": CSP_HEADER}
+
+
+def get_event_recordings(event_id):
+    """Return ``{submission_id: recording}`` for all YouTube links of an event.
+
+    The rendered recordings are cached per event, so that schedule pages
+    don't need any queries once the cache is warm.
+    """
+    key = recordings_cache_key(event_id)
+    recordings = cache.get(key)
+    if recordings is None:
+        recordings = {
+            link.submission_id: _render(link)
+            for link in YouTubeLink.objects.filter(event_id=event_id).only(
+                "submission_id", "video_id"
+            )
+        }
+        cache.set(key, recordings, RECORDINGS_CACHE_TIMEOUT)
+    return recordings
+
+
+def get_submission_recording(submission):
+    """Return the recording of a single submission, or None.
+
+    Cached per submission, under a per-event version that
+    ``invalidate_recordings`` drops, so that a talk page only loads its own
+    recording, and runs a single indexed query on a miss.
+    """
+    version_key = recordings_version_key(submission.event_id)
+    version = cache.get(version_key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(version_key, version, RECORDINGS_CACHE_TIMEOUT):
+            version = cache.get(version_key, version)
+    key = recording_cache_key(submission.event_id, version, submission.pk)
+    recording = cache.get(key)
+    if recording is None:
+        link = (
+            YouTubeLink.objects.filter(submission_id=submission.pk)
+            .only("video_id")
+            .first()
+        )
+        # Cache missing recordings too, as most talks don't have one.
+        recording = _render(link) if link else {}
+        cache.set(key, recording, RECORDINGS_CACHE_TIMEOUT)
+    return recording or None
+
 
 class YouTubeProvider(BaseRecordingProvider):
+    @instrumented("recording")
     def get_recording(self, submission):
-        youtube = getattr(submission, "youtube_link", None)
-        if youtube:
-            return {
-                "iframe": youtube.iframe,
-                "csp_header": "https://www.youtube-nocookie.com/",
-            }
+        recording = get_submission_recording(submission)
+        add_rows(1 if recording else 0)
+        return recording
+
+    @instrumented("recording")
+    def get_recordings(self, submissions):
+        """Return ``{submission code: recording}`` for the given submissions.
+
+        Submissions without a YouTube link are left out. Uses one cached lookup
+        per event, so the cost does not depend on the number of submissions.
+        """
+        result = {}
+        recordings = {}
+        for submission in submissions:
+            if submission.event_id not in recordings:
+                recordings[submission.event_id] = get_event_recordings(
+                    submission.event_id
+                )
+            if recording := recordings[submission.event_id].get(submission.pk):
+                result[submission.code] = recording
+        add_rows(len(result))
+        return result
@@ -3,6 +3,9 @@ from django.urls import reverse
 
 from pretalx.agenda.signals import register_recording_provider
 from pretalx.orga.signals import nav_event_settings
+from pretalx.schedule.signals import schedule_release
+
+from .cache import invalidate_manifest, invalidate_submission_guids
 
 
 @receiver(register_recording_provider)
@@ -24,3 +27,9 @@ def youtube_settings(sender, request, **kwargs):
             == "plugins:pretalx_youtube:settings",
         }
     ]
+
+
+@receiver(schedule_release, dispatch_uid="pretalx_youtube_schedule_release")
+def youtube_schedule_release(sender, schedule, user, **kwargs):
+    invalidate_submission_guids(sender.pk)
+    invalidate_manifest(sender.pk)
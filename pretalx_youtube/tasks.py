@@ -0,0 +1,37 @@
+from django.db import transaction
+from django.utils.timezone import now
+from django_scopes import scope
+
+from pretalx.celery_app import app
+
+from .models import YouTubeWebhookDelivery
+from .webhooks import process_deliveries
+
+
+@app.task(name="pretalx_youtube.process_webhook_deliveries")
+def task_process_webhook_deliveries(deliveries=()):
+    by_event = {}
+    for delivery in YouTubeWebhookDelivery.objects.filter(
+        pk__in=deliveries, status=YouTubeWebhookDelivery.Status.PENDING
+    ).select_related("event"):
+        by_event.setdefault(delivery.event, []).append(delivery)
+    for event, event_deliveries in by_event.items():
+        with scope(event=event):
+            process_deliveries(event, event_deliveries)
+
+
+def enqueue_deliveries(deliveries):
+    """Mark deliveries as pending, and process them in a background task."""
+    pks = [delivery.pk for delivery in deliveries]
+    queued = now()
+    YouTubeWebhookDelivery.objects.filter(pk__in=pks).update(
+        status=YouTubeWebhookDelivery.Status.PENDING, queued=queued
+    )
+    for delivery in deliveries:
+        delivery.status = YouTubeWebhookDelivery.Status.PENDING
+        delivery.queued = queued
+    transaction.on_commit(
+        lambda: task_process_webhook_deliveries.apply_async(
+            kwargs={"deliveries": pks}, ignore_result=True
+        )
+    )
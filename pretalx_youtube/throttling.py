@@ -0,0 +1,76 @@
+import math
+import time
+
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucket:
+    """A token bucket per client IP or per event, kept in the cache.
+
+    Each bucket holds up to ``capacity`` tokens and is refilled with ``rate``
+    tokens per second. Every request takes a token, so clients can send bursts
+    of ``capacity`` requests, and ``rate`` requests per second after that.
+    Concurrent requests may race for the last tokens, which is fine for
+    keeping runaway clients in check.
+    """
+
+    def __init__(self, name, capacity, rate, *, per_event=False):
+        self.name = name
+        self.capacity = capacity
+        self.rate = rate
+        self.per_event = per_event
+
+    def get_ident(self, request):
+        if self.per_event:
+            return request.event.pk
+        # Uses the NUM_PROXIES setting to find the client address, like DRF.
+        return BaseThrottle().get_ident(request)
+
+    def consume(self, ident):
+        """Take a token, returning 0, or the seconds until one is available."""
+        key = f"pretalx_youtube:ratelimit:{self.name}:{ident}"
+        current = time.time()
+        tokens, updated = cache.get(key) or (self.capacity, current)
+        tokens = min(self.capacity, tokens + (current - updated) * self.rate)
+        if tokens < 1:
+            return (1 - tokens) / self.rate
+        # Once the bucket is full again, there is no need to keep it around.
+        cache.set(key, (tokens - 1, current), math.ceil(self.capacity / self.rate))
+        return 0
+
+
+# Client buckets come first, so that a single client can't use up the tokens
+# of an event. The webhook checks its client bucket before authentication, and
+# its event bucket only after, so that unauthenticated clients can't use up the
+# tokens of the real sender.
+WEBHOOK_CLIENT_BUCKETS = [TokenBucket("webhook_ip", capacity=120, rate=2)]
+WEBHOOK_EVENT_BUCKETS = [
+    TokenBucket("webhook_event", capacity=600, rate=10, per_event=True)
+]
+IMPORT_BUCKETS = [
+    TokenBucket("import_ip", capacity=20, rate=1 / 30),
+    TokenBucket("import_event", capacity=10, rate=1 / 60, per_event=True),
+]
+
+
+def get_wait(request, buckets):
+    """Take a token from each bucket, returning the seconds to wait if one is empty.
+
+    Returns 0 if the request may go ahead.
+    """
+    for bucket in buckets:
+        if wait := bucket.consume(bucket.get_ident(request)):
+            return wait
+    return 0
+
+
+class ImportThrottle(BaseThrottle):
+    """Rate-limits the import API, answering with 429 and ``Retry-After``."""
+
+    def allow_request(self, request, view):
+        self.wait_time = get_wait(request, IMPORT_BUCKETS)
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time
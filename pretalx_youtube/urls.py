@@ -3,8 +3,8 @@ from rest_framework import routers
 
 from pretalx.event.models.event import SLUG_REGEX
 
-from .api import YouTubeLinkViewSet
-from .views import C3VOCWebhookView, YouTubeSettings
+from .api import YouTubeLinkExportView, YouTubeLinkViewSet
+from .views import C3VOCWebhookView, RecordingManifestView, YouTubeSettings
 
 router = routers.SimpleRouter()
 router.register(
@@ -19,10 +19,25 @@ urlpatterns = [
         YouTubeSettings.as_view(),
         name="settings",
     ),
+    re_path(
+        rf"^api/organisers/(?P<organiser>{SLUG_REGEX})/p/youtube/export/$",
+        YouTubeLinkExportView.as_view(),
+        name="export",
+    ),
     re_path(
         rf"^(?P<event>{SLUG_REGEX})/p/youtube/c3voc/$",
         C3VOCWebhookView.as_view(),
         name="c3voc_webhook",
     ),
+    re_path(
+        rf"^(?P<event>{SLUG_REGEX})/p/youtube/manifest\.json$",
+        RecordingManifestView.as_view(),
+        name="manifest",
+    ),
+    re_path(
+        rf"^(?P<event>{SLUG_REGEX})/p/youtube/manifest\.(?P<digest>[0-9a-f]{{16}})\.json$",
+        RecordingManifestView.as_view(),
+        name="manifest_hashed",
+    ),
 ]
 urlpatterns += router.urls
@@ -1,3 +1,4 @@
+import functools
 import re
 from urllib.parse import parse_qs, urlparse
 
@@ -5,14 +6,39 @@ MAX_VIDEO_ID_LENGTH = 20
 # YouTube video ids only ever contain these characters. Enforcing the charset
 # keeps HTML metacharacters out of the id, which is embedded into iframe markup.
 VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+INVALID_VIDEO_ID_MESSAGE = "This is not a valid YouTube video id."
 
 
+# Matches the common forms of YouTube URLs in a single step. Other URLs, and
+# those with query strings we'd have to decode, go through the full parser.
+VIDEO_URL_RE = re.compile(
+    r"https?://(?:www\.|m\.)?(?:"
+    r"youtu\.be/(?P<short>[A-Za-z0-9_-]{1,20})(?:[/?#]|\Z)"
+    r"|(?:youtube|youtube-nocookie)\.com/(?:"
+    r"watch\?v=(?P<watch>[A-Za-z0-9_-]{1,20})(?:[&#]|\Z)"
+    r"|(?:embed|shorts|live)/(?P<path>[A-Za-z0-9_-]{1,20})/?"
+    r"(?:\?(?P<query>[^#]*))?(?:#|\Z)"
+    r"))"
+)
+VIDEO_ID_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=VIDEO_ID_CACHE_SIZE)
 def extract_video_id(url):
     """Return the YouTube video id from a URL, or None if nothing usable is found.
 
     Accepts ``youtube.com``, ``youtu.be`` and ``youtube-nocookie.com`` in their
     common variants (``watch?v=``, ``/embed/``, ``/shorts/``, ``/live/``).
     """
+    if match := VIDEO_URL_RE.match(url):
+        query = match["query"]
+        # A v= parameter would take precedence over the path.
+        if not query or ("v" not in query and "%" not in query):
+            return match["short"] or match["watch"] or match["path"]
+    return _parse_video_id(url)
+
+
+def _parse_video_id(url):
     parsed = urlparse(url)
     host = (parsed.netloc or "").lower()
     video_id = None
@@ -31,3 +57,42 @@ def extract_video_id(url):
     if not VIDEO_ID_RE.match(video_id):
         return None
     return video_id
+
+
+def clean_video_id(value):
+    """Return a bare video id from ``value``, or None if it is not a valid id.
+
+    Any URL parts are stripped, keeping only the last path segment.
+    """
+    if "/" in value:
+        parts = [p for p in value.split("/") if p]
+        value = parts[-1] if parts else ""
+    if not value or not VIDEO_ID_RE.match(value):
+        return None
+    return value
+
+
+def normalise_video_ids(values):
+    """Turn a list of video ids and YouTube URLs into bare video ids.
+
+    Accepts everything ``extract_video_id`` does, and like ``clean_video_id``
+    reduces other values with slashes to their last path segment. Returns a
+    list with the video id for each value (None for invalid values), and a
+    dict mapping the indexes of invalid values to an error message.
+    """
+    video_ids = []
+    errors = {}
+    for index, value in enumerate(values):
+        # Bare ids are by far the most common input, so we check them first.
+        if len(value) <= MAX_VIDEO_ID_LENGTH and VIDEO_ID_RE.fullmatch(value):
+            video_id = value
+        else:
+            video_id = ("/" in value and extract_video_id(value)) or clean_video_id(
+                value
+            )
+            if video_id and len(video_id) > MAX_VIDEO_ID_LENGTH:
+                video_id = None
+        if not video_id:
+            errors[index] = INVALID_VIDEO_ID_MESSAGE
+        video_ids.append(video_id)
+    return video_ids, errors
@@ -1,33 +1,70 @@
 import base64
-import csv
+import datetime as dt
 import hmac
 import json
-import logging
+import math
+import uuid
 
 from django.contrib import messages
-from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden
+from django.core.paginator import Paginator
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
+from django.utils.functional import cached_property
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import FormView
 
-from pretalx.common.views.mixins import PermissionRequired
-
-from .api import YouTubeLinkWriteSerializer
-from .forms import FileUploadForm, YouTubeUrlForm
-from .models import YouTubeLink, YouTubeWebhookSettings, generate_webhook_token
-from .utils import extract_video_id
-
-logger = logging.getLogger(__name__)
-
-
-class YouTubeSettings(PermissionRequired, FormView):
+from pretalx.agenda.rules import can_view_schedule, is_agenda_visible
+from pretalx.common.models import CachedFile
+from pretalx.common.views.mixins import PaginationMixin, PermissionRequired
+
+from .cache import invalidate_submission_guids
+from .exporter import EVENT_EXPORT_FIELDS, iter_csv, iter_event_export_rows, iter_json
+from .forms import (
+    FileUploadForm,
+    YouTubeFilterForm,
+    YouTubeUrlForm,
+    get_scheduled_talks,
+)
+from .importer import (
+    ImportFormatError,
+    ImportValidationError,
+    import_links,
+    iter_csv_rows,
+    iter_json_rows,
+)
+from .instrumentation import add_rows, instrumented
+from .manifest import get_manifest
+from .models import YouTubeWebhookDelivery, YouTubeWebhookSettings, hash_webhook_token
+from .tasks import enqueue_deliveries
+from .throttling import WEBHOOK_CLIENT_BUCKETS, WEBHOOK_EVENT_BUCKETS, get_wait
+from .webhooks import (
+    get_video_id,
+    get_webhook_settings,
+    process_deliveries,
+    read_ndjson,
+)
+
+
+@method_decorator(instrumented("settings"), name="dispatch")
+class YouTubeSettings(PermissionRequired, PaginationMixin, FormView):
     permission_required = "event.update_event"
     template_name = "pretalx_youtube/settings.html"
     form_class = YouTubeUrlForm
+    # Keeps rendering and submitting a page cheap, even for huge events.
+    max_page_size = 500
 
     def get_success_url(self):
         return self.request.path
@@ -35,18 +72,67 @@ class YouTubeSettings(PermissionRequired, FormView):
     def get_object(self):
         return self.request.event
 
+    @cached_property
+    def filter_form(self):
+        return YouTubeFilterForm(self.request.GET or None, event=self.request.event)
+
+    @cached_property
+    def page_obj(self):
+        """The page of talks being edited, with the filters applied."""
+        if not self.request.event.current_schedule:
+            return None
+        talks = get_scheduled_talks(self.request.event)
+        if self.filter_form.is_valid():
+            talks = self.filter_form.filter_talks(talks)
+        paginator = Paginator(talks, self.get_paginate_by())
+        return paginator.get_page(self.request.GET.get("page"))
+
+    def get_posted_talks(self):
+        """The talks that were shown on the submitted page.
+
+        The page is rendered with their codes, as the filters, page size and
+        schedule may have changed since.
+        """
+        codes = self.request.POST.get("talks", "").split()
+        return get_scheduled_talks(self.request.event).filter(
+            submission__code__in=codes
+        )
+
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs["event"] = self.request.event
+        if self.request.method == "POST" and self.request.event.current_schedule:
+            kwargs["talks"] = self.get_posted_talks()
+        elif self.page_obj is not None:
+            kwargs["talks"] = self.page_obj.object_list
         return kwargs
 
     def get_context_data(self, *args, **kwargs):
         ctx = super().get_context_data(*args, **kwargs)
         ctx["file_form"] = FileUploadForm()
-        webhook_settings, _created = YouTubeWebhookSettings.objects.get_or_create(
+        ctx["filter_form"] = self.filter_form
+        ctx["page_obj"] = self.page_obj
+        ctx["talk_codes"] = " ".join(
+            talk.submission.code for talk in getattr(ctx["form"], "talks", ())
+        )
+        if self.page_obj is not None:
+            add_rows(len(self.page_obj))
+        ctx["import_errors"] = getattr(self, "import_errors", None)
+        webhook_settings, created = YouTubeWebhookSettings.objects.get_or_create(
             event=self.request.event
         )
         ctx["webhook_settings"] = webhook_settings
+        # Only the hash of the token is stored, so we can show it only once.
+        ctx["webhook_token"] = (
+            webhook_settings.token
+            if created
+            else self.request.session.pop(self.new_token_session_key, None)
+        )
+        ctx["unmatched_deliveries"] = (
+            self.request.event.youtube_webhook_deliveries.filter(
+                YouTubeWebhookDelivery.retry_filter()
+            ).count()
+        )
         ctx["webhook_url"] = self.request.build_absolute_uri(
             reverse(
                 "plugins:pretalx_youtube:c3voc_webhook",
@@ -55,63 +141,221 @@ class YouTubeSettings(PermissionRequired, FormView):
         )
         return ctx
 
+    def run_import(self, cached_file, *, dry_run):
+        """Import the links from an uploaded file, returning the counts.
+
+        Returns ``None`` and shows an error message if the file is not valid.
+        Invalid rows are listed with their line numbers in the context.
+        """
+        reader = (
+            iter_json_rows if cached_file.filename.endswith(".json") else iter_csv_rows
+        )
+        with cached_file.file.open("rb") as file:
+            try:
+                return import_links(self.request.event, reader(file), dry_run=dry_run)
+            except ImportFormatError as e:
+                messages.error(
+                    self.request,
+                    _("The file you uploaded could not be read: ") + str(e),
+                )
+            except ImportValidationError as e:
+                messages.error(
+                    self.request,
+                    _(
+                        "The file you uploaded is not valid, please fix the errors below and upload it again."
+                    ),
+                )
+                self.import_errors = e.errors
+
+    @property
+    def import_file_session_key(self):
+        return f"pretalx_youtube_import_file_{self.request.event.pk}"
+
+    def get_import_file(self):
+        # Only the file uploaded on this event's page may be imported here,
+        # even though the cached file itself is bound to the session only.
+        if self.request.POST.get("import_file") != self.request.session.get(
+            self.import_file_session_key
+        ):
+            return None
+        try:
+            pk = uuid.UUID(self.request.POST.get("import_file", ""))
+        except ValueError:
+            return None
+        return CachedFile.objects.filter(
+            pk=pk, session_key=self.request.session.session_key
+        ).first()
+
     def handle_upload(self):
         # There needs to be exactly one file
         if not self.request.FILES or len(self.request.FILES) > 1:
             messages.error(self.request, _("You need to select a file to upload!"))
             return self.get(self.request)
 
-        # Parse the json or csv file
         file = self.request.FILES["file"]
-        if file.name.endswith(".json"):
-            data = json.load(file)
-        elif file.name.endswith(".csv"):
-            data = csv.DictReader(file.read().decode("utf-8").splitlines())
-        else:
+        if not file.name.endswith((".json", ".csv")):
             messages.error(
                 self.request, _("You need to select a JSON or CSV file to upload!")
             )
             return self.get(self.request)
 
-        for row in data:
-            serializer = YouTubeLinkWriteSerializer(
-                data=row, context={"request": self.request}
+        # We keep the file around until the import is confirmed, so that it
+        # does not have to be uploaded twice.
+        cached_file = CachedFile.objects.create(
+            expires=now() + dt.timedelta(hours=1),
+            timestamp=now(),
+            filename=file.name,
+            content_type=file.content_type or "",
+            session_key=self.request.session.session_key,
+        )
+        cached_file.file.save(file.name, file, save=False)
+        cached_file.save(update_fields=("file",))
+        self.request.session[self.import_file_session_key] = str(cached_file.pk)
+
+        result = self.run_import(cached_file, dry_run=True)
+        if result is None:
+            cached_file.delete()
+            return self.get(self.request)
+        created, updated = result
+        return self.render_to_response(
+            self.get_context_data(
+                import_preview={
+                    "file": cached_file,
+                    "created": created,
+                    "updated": updated,
+                }
             )
-            if not serializer.is_valid():
-                messages.error(
-                    self.request,
-                    _("The file you uploaded is not valid: ") + str(serializer.errors),
-                )
-                return self.get(self.request)
-            serializer.save()
+        )
 
+    def handle_confirm_import(self):
+        cached_file = self.get_import_file()
+        if not cached_file:
+            messages.error(
+                self.request,
+                _("This import has expired, please upload your file again."),
+            )
+            return redirect(self.request.path)
+        result = self.run_import(cached_file, dry_run=False)
+        cached_file.delete()
+        self.request.session.pop(self.import_file_session_key, None)
+        if result is None:
+            return self.get(self.request)
         messages.success(self.request, _("The YouTube URLs were updated."))
-        return self.get(self.request)
+        return redirect(self.request.path)
+
+    def handle_cancel_import(self):
+        if cached_file := self.get_import_file():
+            cached_file.delete()
+            self.request.session.pop(self.import_file_session_key, None)
+        return redirect(self.request.path)
+
+    def handle_toggle_async_webhook(self):
+        webhook_settings, _created = YouTubeWebhookSettings.objects.get_or_create(
+            event=self.request.event
+        )
+        webhook_settings.process_async = not webhook_settings.process_async
+        webhook_settings.save()
+        if webhook_settings.process_async:
+            messages.success(
+                self.request,
+                _("Webhook notifications will be processed in the background."),
+            )
+        else:
+            messages.success(
+                self.request, _("Webhook notifications will be processed immediately.")
+            )
+        return redirect(self.request.path)
+
+    def handle_replay_webhooks(self):
+        # The schedule was most likely fixed since the deliveries came in.
+        invalidate_submission_guids(self.request.event.pk)
+        deliveries = list(
+            self.request.event.youtube_webhook_deliveries.filter(
+                YouTubeWebhookDelivery.retry_filter()
+            )
+        )
+        process_deliveries(self.request.event, deliveries)
+        total = len(deliveries)
+        matched = sum(
+            delivery.status == YouTubeWebhookDelivery.Status.APPLIED
+            for delivery in deliveries
+        )
+        messages.success(
+            self.request,
+            _(
+                "{matched} of {total} replayed webhook notifications now matched a session."
+            ).format(matched=matched, total=total),
+        )
+        return redirect(self.request.path)
+
+    @property
+    def new_token_session_key(self):
+        return f"pretalx_youtube_webhook_token_{self.request.event.pk}"
 
     def handle_rotate_token(self):
         webhook_settings, _created = YouTubeWebhookSettings.objects.get_or_create(
             event=self.request.event
         )
-        webhook_settings.token = generate_webhook_token()
+        self.request.session[self.new_token_session_key] = webhook_settings.set_token()
         webhook_settings.save()
-        messages.success(self.request, _("A new webhook token has been generated."))
+        messages.success(
+            self.request,
+            _(
+                "A new webhook token has been generated. Copy it now, it will not be shown again."
+            ),
+        )
         return redirect(self.request.path)
 
+    def get(self, request, *args, **kwargs):
+        if (output := request.GET.get("export")) in ("csv", "json"):
+            # Check before streaming, as errors while streaming truncate the file.
+            if not request.event.current_schedule:
+                messages.error(request, _("Please create a schedule first!"))
+                return redirect(request.path)
+            return self.export(output)
+        return super().get(request, *args, **kwargs)
+
+    def export(self, output):
+        """Stream all YouTube links of scheduled talks, in a format we can import."""
+        rows = iter_event_export_rows(self.request.event)
+        if output == "csv":
+            response = StreamingHttpResponse(
+                iter_csv(rows, fields=EVENT_EXPORT_FIELDS), content_type="text/csv"
+            )
+        else:
+            response = StreamingHttpResponse(
+                iter_json(rows), content_type="application/json"
+            )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{self.request.event.slug}-youtube.{output}"'
+        )
+        return response
+
     def post(self, *args, **kwargs):
         if self.request.POST.get("action", "") == "rotate_token":
             return self.handle_rotate_token()
+        if self.request.POST.get("action", "") == "toggle_async_webhook":
+            return self.handle_toggle_async_webhook()
+        if self.request.POST.get("action", "") == "replay_webhooks":
+            return self.handle_replay_webhooks()
         if not self.request.event.current_schedule:
             messages.error(self.request, _("Please create a schedule first!"))
             return self.get(self.request, *args, **kwargs)
-        if self.request.POST.get("action", "") == "upload":
+        action = self.request.POST.get("action", "")
+        if action == "upload":
             return self.handle_upload()
+        if action == "confirm_import":
+            return self.handle_confirm_import()
+        if action == "cancel_import":
+            return self.handle_cancel_import()
         form = self.get_form()
         if not form.is_valid():
             messages.error(self.request, _("Please fix the errors below."))
             return self.get(self.request, *args, **kwargs)
         form.save()
         messages.success(self.request, _("The YouTube URLs were updated."))
-        return super().get(self.request, *args, **kwargs)
+        # Stay on the same page, with the same filters
+        return redirect(self.request.get_full_path())
 
 
 def _extract_token(request):
@@ -144,37 +388,7 @@ def _extract_token(request):
     return auth
 
 
-def _find_submission(event, payload):
-    """Match a c3voc webhook payload to a Submission of the given event.
-
-    Uses only identifiers that pretalx itself exports (id, frab slug).
-    """
-    fahrplan = payload.get("fahrplan") or {}
-    conference = fahrplan.get("conference")
-    if conference and conference != event.slug:
-        return None
-
-    # Try the integer fahrplan id (pretalx exports submission.pk here).
-    # Reject bools — isinstance(True, int) is True in Python.
-    fahrplan_id = fahrplan.get("id")
-    if isinstance(fahrplan_id, int) and not isinstance(fahrplan_id, bool):
-        submission = event.submissions.filter(pk=fahrplan_id).first()
-        if submission:
-            return submission
-
-    # Fall back to parsing the frab slug: "{event.slug}-{pk}[...]".
-    slug = fahrplan.get("slug")
-    if slug and slug.startswith(f"{event.slug}-"):
-        remainder = slug[len(event.slug) + 1 :]
-        pk_part = remainder.split("-", 1)[0]
-        if pk_part.isdigit():
-            submission = event.submissions.filter(pk=int(pk_part)).first()
-            if submission:
-                return submission
-
-    return None
-
-
+@method_decorator(instrumented("webhook"), name="dispatch")
 @method_decorator(csrf_exempt, name="dispatch")
 class C3VOCWebhookView(View):
     """Receive ``voctopublish`` publishing notifications.
@@ -187,54 +401,169 @@ class C3VOCWebhookView(View):
     http_method_names = ["post"]
 
     def post(self, request, event):
-        webhook_settings = YouTubeWebhookSettings.objects.filter(
-            event=request.event
-        ).first()
-        if not webhook_settings or not webhook_settings.token:
+        # Throttle clients before doing anything else, so that misbehaving
+        # clients can't keep our workers busy.
+        if wait := get_wait(request, WEBHOOK_CLIENT_BUCKETS):
+            return _too_many_requests(wait)
+
+        webhook_settings = get_webhook_settings(request.event)
+        if not webhook_settings or not webhook_settings["token_hash"]:
             return HttpResponseForbidden()
 
         provided = _extract_token(request)
         if not provided:
             return HttpResponseForbidden()
-        if not hmac.compare_digest(provided, webhook_settings.token):
+        if not hmac.compare_digest(
+            hash_webhook_token(provided), webhook_settings["token_hash"]
+        ):
             return HttpResponseForbidden()
+        if wait := get_wait(request, WEBHOOK_EVENT_BUCKETS):
+            return _too_many_requests(wait)
 
+        if request.content_type == "application/x-ndjson":
+            return self.post_batch(request, webhook_settings, read_ndjson(request))
         try:
             payload = json.loads(request.body.decode("utf-8"))
         except (ValueError, UnicodeDecodeError):
             return HttpResponseBadRequest("invalid json")
-        if not isinstance(payload, dict):
-            return HttpResponseBadRequest("invalid payload")
+        if isinstance(payload, list):
+            return self.post_batch(request, webhook_settings, payload)
 
-        youtube = payload.get("youtube") or {}
-        if not youtube.get("enabled"):
+        try:
+            video_id = get_video_id(payload)
+        except (TypeError, ValueError) as e:
+            return HttpResponseBadRequest(str(e))
+        if not video_id:
             # Nothing for us to do — acknowledge so voctopublish does not retry.
             return HttpResponse(status=204)
-        urls = youtube.get("urls") or []
-        if not isinstance(urls, list) or not urls:
-            return HttpResponseBadRequest("no youtube urls")
 
-        video_id = None
-        for url in urls:
-            if not isinstance(url, str):
-                continue
-            video_id = extract_video_id(url)
-            if video_id:
-                break
-        if not video_id:
-            return HttpResponseBadRequest("no valid youtube url")
+        # Retried notifications are found by their hash, and only looked at
+        # again if they did not match a submission the first time round.
+        delivery, created = YouTubeWebhookDelivery.objects.get_or_create(
+            event=request.event,
+            payload_hash=YouTubeWebhookDelivery.hash_payload(payload),
+            defaults={"payload": payload, "video_id": video_id},
+        )
+        if delivery.status == YouTubeWebhookDelivery.Status.APPLIED:
+            return HttpResponse(status=204)
 
-        submission = _find_submission(request.event, payload)
-        if not submission:
+        if webhook_settings["process_async"]:
+            # Matching and writing need the database, so we hand them off to a
+            # background task and return right away.
+            if created or delivery.needs_retry:
+                enqueue_deliveries([delivery])
+            return HttpResponse(status=202)
+
+        process_deliveries(request.event, [delivery])
+        if not delivery.submission:
             return HttpResponse(status=404)
-        YouTubeLink.objects.update_or_create(
-            submission=submission, defaults={"video_id": video_id}
+        return HttpResponse(status=204)
+
+    def post_batch(self, request, webhook_settings, payloads):
+        """Handle a list of payloads, reporting a status for each of them.
+
+        The status is ``applied``, ``unmatched``, ``pending`` (when processing
+        in the background), ``skipped`` (when the payload is not about YouTube)
+        or ``invalid``. Takes a constant number of queries.
+        """
+        event = request.event
+        results = [None] * len(payloads)
+        received = {}
+        for position, payload in enumerate(payloads):
+            try:
+                video_id = get_video_id(payload)
+            except (TypeError, ValueError) as e:
+                results[position] = {"status": "invalid", "error": str(e)}
+                continue
+            if not video_id:
+                results[position] = {"status": "skipped"}
+                continue
+            payload_hash = YouTubeWebhookDelivery.hash_payload(payload)
+            received.setdefault(payload_hash, (payload, video_id, []))[2].append(
+                position
+            )
+
+        deliveries = {
+            delivery.payload_hash: delivery
+            for delivery in event.youtube_webhook_deliveries.filter(
+                payload_hash__in=received
+            ).select_related("submission")
+        }
+        new = YouTubeWebhookDelivery.objects.bulk_create(
+            YouTubeWebhookDelivery(
+                event=event,
+                payload=payload,
+                payload_hash=payload_hash,
+                video_id=video_id,
+            )
+            for payload_hash, (payload, video_id, _positions) in received.items()
+            if payload_hash not in deliveries
         )
+        to_process = [
+            delivery for delivery in deliveries.values() if delivery.needs_retry
+        ] + new
+        deliveries.update((delivery.payload_hash, delivery) for delivery in new)
+
+        if webhook_settings["process_async"]:
+            if to_process:
+                enqueue_deliveries(to_process)
+        elif to_process:
+            process_deliveries(event, to_process)
+
+        for payload_hash, (_payload, _video_id, positions) in received.items():
+            delivery = deliveries[payload_hash]
+            result = {"status": delivery.status}
+            if delivery.submission_id:
+                result["submission"] = delivery.submission.code
+            for position in positions:
+                results[position] = result
+        return JsonResponse({"results": results})
+
+
+def _too_many_requests(wait):
+    response = HttpResponse(status=429)
+    response["Retry-After"] = math.ceil(wait)
+    return response
+
+
+@method_decorator(instrumented("manifest"), name="dispatch")
+class RecordingManifestView(View):
+    """Serve the recordings of all scheduled talks of an event as JSON.
+
+    ``manifest.json`` redirects to ``manifest.<digest>.json``, which never
+    changes and can be cached for as long as a CDN likes. Visible to whoever
+    can see the schedule, like the ``YouTubeLink`` API.
+    """
 
-        logger.info(
-            "c3voc webhook: set YouTube video %s for submission %s (event %s)",
-            video_id,
-            submission.code,
-            request.event.slug,
+    http_method_names = ["get", "head"]
+    # Long enough to absorb bursts, short enough to pick up changes quickly.
+    REDIRECT_MAX_AGE = 60
+    MAX_AGE = 365 * 24 * 60 * 60
+
+    def get(self, request, event, digest=None):
+        if not can_view_schedule(request.user, request.event):
+            raise Http404
+        content, current_digest = get_manifest(request.event)
+        # While the schedule is not public, only the event's team can see the
+        # manifest, so shared caches must not keep it.
+        public = is_agenda_visible(None, request.event)
+        if digest != current_digest:
+            response = redirect(
+                "plugins:pretalx_youtube:manifest_hashed",
+                event=request.event.slug,
+                digest=current_digest,
+            )
+            return self.cache(response, public, max_age=self.REDIRECT_MAX_AGE)
+
+        etag = f'"{current_digest}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type="application/json")
+        response["ETag"] = etag
+        return self.cache(response, public, max_age=self.MAX_AGE, immutable=True)
+
+    def cache(self, response, public, **kwargs):
+        patch_cache_control(
+            response, **{"public" if public else "private": True}, **kwargs
         )
-        return HttpResponse(status=204)
+        return response
@@ -0,0 +1,250 @@
+import json
+import logging
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .cache import (
+    SUBMISSION_GUIDS_CACHE_TIMEOUT,
+    WEBHOOK_SETTINGS_CACHE_TIMEOUT,
+    invalidate_recordings,
+    submission_guid_cache_key,
+    submission_guids_version_key,
+    webhook_settings_cache_key,
+)
+from .forms import get_scheduled_talks
+from .importer import write_links
+from .instrumentation import add_rows
+from .models import YouTubeWebhookDelivery, YouTubeWebhookSettings
+from .utils import extract_video_id
+
+logger = logging.getLogger(__name__)
+
+# The fahrplan fields we use to find the submission, and their allowed types
+FAHRPLAN_FIELD_TYPES = {"conference": str, "id": (int, str), "guid": str, "slug": str}
+
+
+def get_webhook_settings(event):
+    """Return the event's webhook ``token_hash`` and ``process_async``, or None.
+
+    Cached until the settings change, so that requests are authenticated
+    without any queries.
+    """
+    key = webhook_settings_cache_key(event.pk)
+    webhook_settings = cache.get(key)
+    if webhook_settings is None:
+        # Cache missing settings as an empty dict, so they cost no queries either.
+        webhook_settings = (
+            YouTubeWebhookSettings.objects.filter(event=event)
+            .values("token_hash", "process_async")
+            .first()
+            or {}
+        )
+        cache.set(key, webhook_settings, WEBHOOK_SETTINGS_CACHE_TIMEOUT)
+    return webhook_settings or None
+
+
+def read_ndjson(request):
+    """Parse a newline-delimited JSON body, keeping unreadable lines as None."""
+    payloads = []
+    for line in request.body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            payloads.append(json.loads(line.decode("utf-8")))
+        except (ValueError, UnicodeDecodeError):
+            payloads.append(None)
+    return payloads
+
+
+def get_video_id(payload):
+    """Return the video id announced in a c3voc webhook payload.
+
+    Returns None if the payload is not about YouTube. Raises ``TypeError`` for
+    malformed payloads, and ``ValueError`` if the payload is about YouTube but
+    does not contain a usable YouTube URL.
+    """
+    if not isinstance(payload, dict):
+        raise TypeError("invalid payload")
+    fahrplan = payload.get("fahrplan") or {}
+    if not isinstance(fahrplan, dict):
+        raise TypeError("invalid fahrplan")
+    for field, types in FAHRPLAN_FIELD_TYPES.items():
+        value = fahrplan.get(field)
+        if value is not None and (
+            not isinstance(value, types) or isinstance(value, bool)
+        ):
+            raise TypeError(f"invalid fahrplan {field}")
+    youtube = payload.get("youtube") or {}
+    if not isinstance(youtube, dict):
+        raise TypeError("invalid payload")
+    if not youtube.get("enabled"):
+        return None
+    urls = youtube.get("urls") or []
+    if not isinstance(urls, list) or not urls:
+        raise ValueError("no youtube urls")
+    for url in urls:
+        if isinstance(url, str) and (video_id := extract_video_id(url)):
+            return video_id
+    raise ValueError("no valid youtube url")
+
+
+def get_cached_submission_guids(event, guids):
+    """Map those of the given talk guids that we know to submission ids.
+
+    Guids are derived from submission codes, so they can't be looked up in the
+    database. Instead, they are cached one key per guid by
+    ``load_submission_guids``, under a version that is dropped when a schedule
+    is released. Returns None if they are not cached at the moment.
+    """
+    version = cache.get(submission_guids_version_key(event.pk))
+    if version is None:
+        return None
+    keys = {guid: submission_guid_cache_key(event.pk, version, guid) for guid in guids}
+    found = cache.get_many(keys.values())
+    return {guid: found[key] for guid, key in keys.items() if key in found}
+
+
+def load_submission_guids(event):
+    """Return the scheduled submissions of an event by guid, and cache them.
+
+    Takes a single query, for all scheduled talks at once.
+    """
+    submissions = {}
+    if event.current_schedule:
+        for talk in get_scheduled_talks(event):
+            talk.submission.event = event
+            submissions[str(talk.uuid)] = talk.submission
+    version = uuid.uuid4().hex
+    cache.set_many(
+        {
+            submission_guid_cache_key(event.pk, version, guid): submission.pk
+            for guid, submission in submissions.items()
+        },
+        SUBMISSION_GUIDS_CACHE_TIMEOUT,
+    )
+    # Set last, so that the version is only seen with all of its guids
+    cache.set(
+        submission_guids_version_key(event.pk), version, SUBMISSION_GUIDS_CACHE_TIMEOUT
+    )
+    return submissions
+
+
+def _submission_keys(event, payload):
+    """Return the identifiers in a c3voc webhook payload, best first.
+
+    These are ``("id", pk)``, ``("code", code)`` and ``("guid", guid)``
+    pairs, using only identifiers that pretalx itself exports (id, frab slug,
+    guid), and the submission code.
+    """
+    fahrplan = payload.get("fahrplan") or {}
+    if not isinstance(fahrplan, dict):
+        # Only deliveries stored before payloads were validated can get here.
+        return []
+    conference = fahrplan.get("conference")
+    if conference and conference != event.slug:
+        return []
+
+    keys = []
+    # The fahrplan id is the submission pk in pretalx exports. Reject bools —
+    # isinstance(True, int) is True in Python.
+    fahrplan_id = fahrplan.get("id")
+    if isinstance(fahrplan_id, int) and not isinstance(fahrplan_id, bool):
+        keys.append(("id", fahrplan_id))
+    elif isinstance(fahrplan_id, str) and fahrplan_id:
+        keys.append(
+            ("id", int(fahrplan_id)) if fahrplan_id.isdigit() else ("code", fahrplan_id)
+        )
+    guid = fahrplan.get("guid")
+    if isinstance(guid, str) and guid:
+        keys.append(("guid", guid.lower()))
+    slug = fahrplan.get("slug")
+    if isinstance(slug, str) and slug.startswith(f"{event.slug}-"):
+        # Frab slugs look like "{event.slug}-{pk}[-{title}]".
+        pk_part = slug[len(event.slug) + 1 :].split("-", 1)[0]
+        if pk_part.isdigit():
+            keys.append(("id", int(pk_part)))
+    return keys
+
+
+def match_submissions(event, payloads):
+    """Return the submission each c3voc webhook payload refers to, or None.
+
+    Ids, codes and cached guids of all payloads are looked up in a single
+    indexed query. Only if the guids are not cached, and some payloads don't
+    match before their guid, loading the guids takes one more query.
+    """
+    all_keys = [_submission_keys(event, payload) for payload in payloads]
+    guids = {value for keys in all_keys for kind, value in keys if kind == "guid"}
+    guid_ids = get_cached_submission_guids(event, guids) if guids else {}
+    ids = {value for keys in all_keys for kind, value in keys if kind == "id"}
+    ids.update((guid_ids or {}).values())
+    codes = {value for keys in all_keys for kind, value in keys if kind == "code"}
+    by_key = {}
+    if ids or codes:
+        for submission in event.submissions.filter(Q(pk__in=ids) | Q(code__in=codes)):
+            by_key["id", submission.pk] = by_key["code", submission.code] = submission
+
+    if guid_ids is not None:
+        for guid, submission_id in guid_ids.items():
+            if submission := by_key.get(("id", submission_id)):
+                by_key["guid", guid] = submission
+    elif any(_needs_guid(keys, by_key) for keys in all_keys):
+        by_key.update(
+            (("guid", guid), submission)
+            for guid, submission in load_submission_guids(event).items()
+        )
+    return [
+        next((by_key[key] for key in keys if key in by_key), None) for keys in all_keys
+    ]
+
+
+def _needs_guid(keys, by_key):
+    """Whether a payload's guid has to be looked up to match it."""
+    for kind, value in keys:
+        if (kind, value) in by_key:
+            return False
+        if kind == "guid":
+            return True
+    return False
+
+
+def process_deliveries(event, deliveries):
+    """Apply webhook deliveries to the submissions they refer to.
+
+    Records the outcome on each delivery. Uses a constant number of queries,
+    however many deliveries there are; if several deliveries refer to the same
+    submission, the last one wins.
+    """
+    add_rows(len(deliveries))
+    submissions = match_submissions(
+        event, [delivery.payload for delivery in deliveries]
+    )
+    video_ids = {}
+    processed = now()
+    for delivery, submission in zip(deliveries, submissions, strict=True):
+        if submission:
+            delivery.status = YouTubeWebhookDelivery.Status.APPLIED
+            video_ids[submission] = delivery.video_id
+        else:
+            delivery.status = YouTubeWebhookDelivery.Status.UNMATCHED
+        delivery.submission = submission
+        delivery.processed = processed
+
+    with transaction.atomic():
+        if video_ids:
+            write_links(video_ids)
+            invalidate_recordings(event.pk)
+        YouTubeWebhookDelivery.objects.bulk_update(
+            deliveries, fields=["status", "submission", "processed"]
+        )
+    for submission, video_id in video_ids.items():
+        logger.info(
+            "c3voc webhook: set YouTube video %s for submission %s (event %s)",
+            video_id,
+            submission.code,
+            event.slug,
+        )
@@ -13,7 +13,28 @@ from pretalx.schedule.domain.release import freeze_schedule
 from pretalx.schedule.models import Room, TalkSlot
 from pretalx.submission.models import Submission, SubmissionType
 
-from pretalx_youtube.models import YouTubeLink
+from pretalx_youtube.models import YouTubeLink, YouTubeWebhookSettings
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--benchmarks", action="store_true", help="Run the (slow) benchmarks."
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: slow benchmark, only run with --benchmarks"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks only run with --benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -59,6 +80,27 @@ def event(organiser):
     return event
 
 
+@pytest.fixture
+def other_event(event):
+    """A second event of the same organiser, with the plugin enabled."""
+    with scopes_disabled():
+        other = Event.objects.create(
+            name="Other testevent",
+            is_public=True,
+            slug="other",
+            email="orga@orga.org",
+            date_from=event.date_from,
+            date_to=event.date_to,
+            organiser=event.organiser,
+        )
+        initialise_event(other)
+        enable_plugin(other, "pretalx_youtube")
+        other.save()
+        for team in event.organiser.teams.all():
+            team.limit_events.add(other)
+    return other
+
+
 @pytest.fixture
 def orga_user(event):
     with scopes_disabled():
@@ -182,3 +224,81 @@ def youtube_link(confirmed_submission):
     return YouTubeLink.objects.create(
         submission=confirmed_submission, video_id="dQw4w9WgXcQ"
     )
+
+
+@pytest.fixture
+def make_slots(event, submission_type, room, schedule):
+    """Return a factory that adds ``count`` visible talks to the current schedule.
+
+    Uses bulk inserts, so that large schedules are cheap to set up.
+    """
+
+    def factory(count, *, state="confirmed"):
+        with scope(event=event):
+            offset = event.submissions.count()
+            submissions = Submission.objects.bulk_create(
+                Submission(
+                    code=f"B{offset + index:06d}",
+                    title=f"Generated Talk {offset + index}",
+                    submission_type=submission_type,
+                    event=event,
+                    state=state,
+                    content_locale="en",
+                )
+                for index in range(count)
+            )
+            start = event.datetime_from
+            TalkSlot.objects.bulk_create(
+                TalkSlot(
+                    submission=submission,
+                    schedule=schedule,
+                    room=room,
+                    is_visible=True,
+                    start=start + dt.timedelta(minutes=index),
+                    end=start + dt.timedelta(minutes=index + 1),
+                )
+                for index, submission in enumerate(submissions)
+            )
+        return submissions
+
+    return factory
+
+
+@pytest.fixture
+def make_links(event):
+    """Return a factory that adds YouTube links to the given submissions.
+
+    The videos are called ``vid0``, ``vid1`` and so on, unless ``video_id``
+    is given. Uses bulk inserts, like ``make_slots``.
+    """
+
+    def factory(submissions, *, video_id=None):
+        return YouTubeLink.objects.bulk_create(
+            YouTubeLink(
+                submission=submission, event=event, video_id=video_id or f"vid{index}"
+            )
+            for index, submission in enumerate(submissions)
+        )
+
+    return factory
+
+
+@pytest.fixture
+def locmem_cache(settings):
+    """Use a real cache backend instead of the test settings' dummy cache."""
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+    from django.core.cache import cache  # noqa: PLC0415
+
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+@pytest.fixture
+def webhook_settings(event):
+    webhook_settings = YouTubeWebhookSettings(event=event)
+    webhook_settings.set_token("secret-token-xyz")
+    webhook_settings.save()
+    return webhook_settings
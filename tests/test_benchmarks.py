@@ -0,0 +1,272 @@
+import itertools
+import json
+import math
+import time
+import tracemalloc
+from typing import NamedTuple
+
+import pytest
+from django.db import connection, transaction
+from django.urls import reverse
+from django_scopes import scope
+
+from pretalx_youtube.importer import BATCH_SIZE, import_links, iter_csv_rows
+from pretalx_youtube.models import YouTubeLink
+from pretalx_youtube.utils import _parse_video_id, extract_video_id
+from pretalx_youtube.views import YouTubeSettings
+
+SETTINGS_URL_NAME = "plugins:pretalx_youtube:settings"
+
+URL_TEMPLATES = (
+    "https://www.youtube.com/watch?v={}",
+    "https://youtube.com/watch?v={}&t=42s",
+    "https://youtu.be/{}",
+    "https://youtu.be/{}?si=AbCdEfGh",
+    "https://www.youtube.com/embed/{}",
+    "https://www.youtube-nocookie.com/embed/{}",
+    "https://www.youtube.com/shorts/{}?feature=share",
+    "https://www.youtube.com/live/{}",
+)
+
+
+def _timed(function, corpus):
+    start = time.perf_counter()
+    for url in corpus:
+        function(url)
+    return time.perf_counter() - start
+
+
+@pytest.mark.benchmark
+def test_extract_video_id_speed():
+    """Compare the fast path to the full parser on a million URLs.
+
+    The corpus has 80,000 distinct URLs, many more than fit into the cache,
+    so this measures the compiled matcher as much as the cache.
+    """
+    urls = [
+        template.format(f"vid{number:08d}")
+        for number, template in itertools.product(range(10_000), URL_TEMPLATES)
+    ]
+    corpus = [urls[(i * 7919) % len(urls)] for i in range(1_000_000)]
+    extract_video_id.cache_clear()
+
+    full = _timed(_parse_video_id, corpus)
+    fast = _timed(extract_video_id, corpus)
+    print(  # noqa: T201
+        f"\nextract_video_id: {full:.2f}s with the full parser, {fast:.2f}s now"
+    )
+    assert fast * 3 < full
+
+
+# The query budgets on the smallest event are part of the normal test run, so
+# that an N+1 query shows up in CI; the larger events only run as benchmarks.
+SIZES = (
+    100,
+    pytest.param(1_000, marks=pytest.mark.benchmark),
+    pytest.param(10_000, marks=pytest.mark.benchmark),
+)
+
+
+class Budget(NamedTuple):
+    """Limits for one operation on an event with ``size`` submissions.
+
+    Query counts must not grow with the size of the event (imports may run a
+    few queries per batch), while time and memory may grow linearly.
+    """
+
+    queries: int
+    seconds_per_1000: float
+    megabytes_per_1000: float
+    queries_per_import_batch: int = 0
+
+    def check(self, size, measurement, *, queries_only=False):
+        batches = math.ceil(size / BATCH_SIZE)
+        limits = {"queries": self.queries + self.queries_per_import_batch * batches}
+        if not queries_only:
+            # Small events get the budget of 1,000 submissions, so that fixed
+            # costs and timer noise don't fail the run.
+            limits["seconds"] = self.seconds_per_1000 * max(size, 1_000) / 1_000
+            limits["megabytes"] = self.megabytes_per_1000 * max(size, 1_000) / 1_000
+        over = {
+            key: f"{measurement[key]:.2f} > {limit:.2f}"
+            for key, limit in limits.items()
+            if measurement[key] > limit
+        }
+        assert not over, f"over budget: {over}"
+
+
+# The agreed budgets, with about twice the time and memory we measured, to
+# leave room for slower machines. Requests are measured with a warm cache.
+BUDGETS = {
+    "import": Budget(
+        queries=4, queries_per_import_batch=6, seconds_per_1000=2, megabytes_per_1000=8
+    ),
+    "settings_render": Budget(queries=30, seconds_per_1000=2, megabytes_per_1000=16),
+    "settings_save": Budget(queries=25, seconds_per_1000=1.5, megabytes_per_1000=8),
+    "api_list": Budget(queries=10, seconds_per_1000=0.5, megabytes_per_1000=3),
+    "webhook": Budget(queries=20, seconds_per_1000=0.2, megabytes_per_1000=3.5),
+    "webhook_batch": Budget(queries=20, seconds_per_1000=0.5, megabytes_per_1000=4),
+}
+
+
+def _measure(function):
+    """Measure the wall time, SQL queries and peak memory of ``function``.
+
+    The function runs twice: rolled back while timing it, as tracing memory
+    allocations slows it down, and then for real while tracing them.
+    """
+    queries = 0
+
+    def count_query(execute, *args):
+        nonlocal queries
+        queries += 1
+        return execute(*args)
+
+    # CaptureQueriesContext would lose queries when the test client resets
+    # the query log at the start of each request.
+    with transaction.atomic(), connection.execute_wrapper(count_query):
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        transaction.set_rollback(True)
+    tracemalloc.start()
+    try:
+        result = function()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {
+        "seconds": seconds,
+        "queries": queries,
+        "megabytes": peak / 1024 / 1024,
+    }
+
+
+@pytest.fixture
+def check_budget(pytestconfig):
+    """Return a function that checks a measurement against its budget.
+
+    Time and memory are only checked with ``--benchmarks``, as they depend on
+    the machine the tests run on.
+    """
+    queries_only = not pytestconfig.getoption("--benchmarks")
+
+    def check(name, size, measurement):
+        print(  # noqa: T201
+            f"\n{name} ({size} submissions): {measurement['seconds']:.3f}s, "
+            f"{measurement['queries']} queries, {measurement['megabytes']:.1f} MB"
+        )
+        BUDGETS[name].check(size, measurement, queries_only=queries_only)
+
+    return check
+
+
+@pytest.fixture(params=SIZES, ids=lambda size: f"{size}_submissions")
+def sized_event(request, event, make_slots, locmem_cache):
+    """An event whose current schedule has 100, 1,000 or 10,000 talks."""
+    return event, make_slots(request.param)
+
+
+@pytest.mark.django_db
+def test_import_budget(sized_event, check_budget, make_links):
+    event, submissions = sized_event
+    # Half of the links exist already, so that both inserts and updates happen.
+    with scope(event=event):
+        make_links(submissions[::2], video_id="old")
+    data = "submission,video_id\n" + "".join(
+        f"{submission.code},https://youtu.be/vid{index:08d}\n"
+        for index, submission in enumerate(submissions)
+    )
+
+    def run():
+        with scope(event=event):
+            return import_links(event, iter_csv_rows(data))
+
+    result, measurement = _measure(run)
+    assert sum(result) == len(submissions)
+    check_budget("import", len(submissions), measurement)
+
+
+@pytest.mark.django_db
+def test_settings_render_budget(sized_event, orga_client, check_budget):
+    event, submissions = sized_event
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    query = {"page_size": YouTubeSettings.max_page_size}
+    orga_client.get(url, query)
+    response, measurement = _measure(lambda: orga_client.get(url, query))
+    assert response.status_code == 200
+    check_budget("settings_render", len(submissions), measurement)
+
+
+@pytest.mark.django_db
+def test_settings_save_budget(sized_event, orga_client, check_budget):
+    event, submissions = sized_event
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    url += f"?page_size={YouTubeSettings.max_page_size}"
+    page = submissions[: YouTubeSettings.max_page_size]
+    data = {
+        f"video_id_{submission.code}": f"https://youtu.be/vid{index:08d}"
+        for index, submission in enumerate(page)
+    }
+    data["talks"] = " ".join(submission.code for submission in page)
+    orga_client.get(url)
+    response, measurement = _measure(lambda: orga_client.post(url, data))
+    assert response.status_code == 302
+    assert YouTubeLink.objects.filter(submission__event=event).count() == len(page)
+    check_budget("settings_save", len(submissions), measurement)
+
+
+@pytest.mark.django_db
+def test_api_list_budget(sized_event, api_client, check_budget, make_links):
+    event, submissions = sized_event
+    with scope(event=event):
+        make_links(submissions)
+    url = f"/api/events/{event.slug}/p/youtube/"
+    query = {"pagination": "cursor"}
+    api_client.get(url, query)
+    response, measurement = _measure(lambda: api_client.get(url, query))
+    assert response.status_code == 200
+    check_budget("api_list", len(submissions), measurement)
+
+
+def _payload(event, submission):
+    return {
+        "fahrplan": {"conference": event.slug, "id": submission.pk},
+        "youtube": {"enabled": True, "urls": ["https://youtu.be/abcDEF12345"]},
+    }
+
+
+def _post_webhook(client, event, data, token):
+    url = reverse("plugins:pretalx_youtube:c3voc_webhook", kwargs={"event": event.slug})
+    return client.post(
+        url,
+        data=json.dumps(data),
+        content_type="application/json",
+        HTTP_AUTHORIZATION=token,
+    )
+
+
+@pytest.mark.django_db
+def test_webhook_budget(sized_event, client, webhook_settings, check_budget):
+    event, submissions = sized_event
+    token = webhook_settings.token
+    _post_webhook(client, event, _payload(event, submissions[0]), token)
+    payload = _payload(event, submissions[-1])
+    response, measurement = _measure(
+        lambda: _post_webhook(client, event, payload, token)
+    )
+    assert response.status_code == 204
+    check_budget("webhook", len(submissions), measurement)
+
+
+@pytest.mark.django_db
+def test_webhook_batch_budget(sized_event, client, webhook_settings, check_budget):
+    event, submissions = sized_event
+    token = webhook_settings.token
+    _post_webhook(client, event, _payload(event, submissions[0]), token)
+    payloads = [_payload(event, submission) for submission in submissions[-100:]]
+    response, measurement = _measure(
+        lambda: _post_webhook(client, event, payloads, token)
+    )
+    assert response.status_code == 200
+    check_budget("webhook_batch", len(submissions), measurement)
@@ -1,24 +1,66 @@
 import base64
+import csv
+import datetime as dt
+import io
 import json
+import logging
+import math
+import sys
+import uuid
 from unittest.mock import MagicMock, patch
 
 import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from django_scopes import scope
+from django.utils.timezone import now
+from django_scopes import scope, scopes_disabled
+from rest_framework.test import APIClient
 
 from pretalx.agenda.signals import register_recording_provider
+from pretalx.common.models import CachedFile
+from pretalx.event.models import Event
+from pretalx.person.models.auth_token import ENDPOINTS, UserApiToken
+from pretalx.schedule.domain.release import freeze_schedule
+from pretalx.schedule.models import Room, TalkSlot
+from pretalx.schedule.signals import schedule_release
+from pretalx.submission.models import Submission
 
 from pretalx_youtube.api import (
+    YouTubeLinkExportView,
     YouTubeLinkSerializer,
     YouTubeLinkViewSet,
     YouTubeLinkWriteSerializer,
 )
+from pretalx_youtube.cache import webhook_settings_cache_key
 from pretalx_youtube.forms import YouTubeUrlForm
-from pretalx_youtube.models import YouTubeLink, YouTubeWebhookSettings
+from pretalx_youtube.importer import (
+    ImportFormatError,
+    ImportValidationError,
+    import_links,
+    iter_csv_rows,
+    iter_json_rows,
+)
+from pretalx_youtube.instrumentation import get_config, get_metrics
+from pretalx_youtube.models import (
+    YouTubeLink,
+    YouTubeLinkDeletion,
+    YouTubeWebhookDelivery,
+    YouTubeWebhookSettings,
+    hash_webhook_token,
+)
 from pretalx_youtube.recording import YouTubeProvider
-from pretalx_youtube.utils import extract_video_id
-from pretalx_youtube.views import YouTubeSettings, _find_submission
+from pretalx_youtube.tasks import task_process_webhook_deliveries
+from pretalx_youtube.throttling import (
+    IMPORT_BUCKETS,
+    WEBHOOK_CLIENT_BUCKETS,
+    WEBHOOK_EVENT_BUCKETS,
+)
+from pretalx_youtube.utils import _parse_video_id, extract_video_id, normalise_video_ids
+from pretalx_youtube.views import YouTubeSettings
+from pretalx_youtube.webhooks import match_submissions, process_deliveries
 
 SETTINGS_URL_NAME = "plugins:pretalx_youtube:settings"
 WEBHOOK_URL_NAME = "plugins:pretalx_youtube:c3voc_webhook"
@@ -53,6 +95,26 @@ def test_youtube_link_properties(youtube_link):
     assert youtube_link.player_link in youtube_link.iframe
 
 
+@pytest.mark.django_db
+def test_youtube_link_copies_submission_event(event, youtube_link, make_slots):
+    assert youtube_link.event == event
+    submission, form_submission = make_slots(2)
+    with scope(event=event):
+        import_links(event, [(1, {"submission": submission.code, "video_id": "vid"})])
+        form = YouTubeUrlForm(
+            event=event,
+            data={
+                f"video_id_{submission.code}": "https://youtu.be/vid",
+                f"video_id_{form_submission.code}": "https://youtu.be/vid",
+            },
+        )
+        assert form.is_valid()
+        form.save()
+    assert set(
+        YouTubeLink.objects.filter(event=event).values_list("submission", flat=True)
+    ) == {youtube_link.submission_id, submission.pk, form_submission.pk}
+
+
 @pytest.mark.django_db
 def test_youtube_link_iframe_escapes_video_id(confirmed_submission):
     # The iframe is rendered with |safe on the public talk page; even though the
@@ -79,6 +141,44 @@ def test_extract_video_id_rejects_non_charset(url):
     assert extract_video_id(url) is None
 
 
+@pytest.mark.parametrize(
+    "url",
+    (
+        "https://www.youtube.com/watch?v=abcDEF12345",
+        "https://youtube.com/watch?v=abcDEF12345&t=42s",
+        "https://m.youtube.com/watch?v=abcDEF12345#t=1",
+        "https://www.youtube.com/watch?v=abcDEF12345%41",
+        "https://www.youtube.com/watch?v=abcDEF12345\n",
+        "https://www.youtube.com/watch?v=" + "a" * 21,
+        "https://www.youtube.com/watch?feature=share&v=abcDEF12345",
+        "https://www.youtube.com/watch?v=",
+        "https://www.youtube.com/watch",
+        "https://www.youtube.com/embed/abcDEF12345",
+        "https://www.youtube.com/embed/abcDEF12345/?si=xyz",
+        "https://www.youtube.com/embed/abcDEF12345?v=zyxWVU98765",
+        "https://www.youtube.com/shorts/abcDEF12345?feature=share",
+        "https://www.youtube.com/shorts/abcDEF12345?%76=zyxWVU98765",
+        "https://www.youtube.com/live/abcDEF12345#chat",
+        "https://www.youtube-nocookie.com/embed/abcDEF12345",
+        "https://youtu.be/abcDEF12345",
+        "https://youtu.be/abcDEF12345?si=xyz",
+        "https://youtu.be/abcDEF12345/extra",
+        "https://youtu.be/",
+        "HTTPS://YOUTU.BE/abcDEF12345",
+        "https://www.youtube.com:443/watch?v=abcDEF12345",
+        "https://user@youtube.com/watch?v=abcDEF12345",
+        " https://youtu.be/abcDEF12345",
+        "//youtu.be/abcDEF12345",
+        "youtu.be/abcDEF12345",
+        "https://example.com/watch?v=abcDEF12345",
+        "https://notyoutube.com/embed/abcDEF12345",
+        "",
+    ),
+)
+def test_extract_video_id_matches_full_parser(url):
+    assert extract_video_id(url) == _parse_video_id(url)
+
+
 # -- Recording provider tests --
 
 
@@ -98,6 +198,77 @@ def test_recording_provider_without_link(event, confirmed_submission):
     assert result is None
 
 
+@pytest.mark.django_db
+def test_recording_provider_is_cached(
+    event, confirmed_submission, youtube_link, locmem_cache, django_assert_num_queries
+):
+    provider = YouTubeProvider(event)
+    first = provider.get_recording(confirmed_submission)
+    with django_assert_num_queries(0):
+        assert provider.get_recording(confirmed_submission) == first
+    assert youtube_link.player_link in first["iframe"]
+
+
+@pytest.mark.django_db
+def test_recording_provider_loads_single_recording(
+    event, make_slots, locmem_cache, django_assert_num_queries, make_links
+):
+    submissions = make_slots(3)
+    make_links(submissions)
+    provider = YouTubeProvider(event)
+    with django_assert_num_queries(1):
+        assert "embed/vid1" in provider.get_recording(submissions[1])["iframe"]
+    assert locmem_cache.get(f"pretalx_youtube:recordings:{event.pk}") is None
+    with django_assert_num_queries(0):
+        assert "embed/vid1" in provider.get_recording(submissions[1])["iframe"]
+
+
+@pytest.mark.django_db
+def test_recording_provider_batch_lookup(
+    event, make_slots, locmem_cache, django_assert_num_queries, make_links
+):
+    submissions = make_slots(50)
+    make_links(submissions[:20])
+    provider = YouTubeProvider(event)
+    with django_assert_num_queries(1):
+        recordings = provider.get_recordings(submissions)
+    assert list(recordings) == [submission.code for submission in submissions[:20]]
+    assert "embed/vid3" in recordings[submissions[3].code]["iframe"]
+    with django_assert_num_queries(0):
+        assert provider.get_recordings(submissions) == recordings
+    assert provider.get_recordings([]) == {}
+
+
+@pytest.mark.django_db
+def test_recording_cache_is_invalidated_on_save_and_delete(
+    event, confirmed_submission, youtube_link, locmem_cache
+):
+    provider = YouTubeProvider(event)
+    assert provider.get_recording(confirmed_submission)
+    youtube_link.video_id = "changed"
+    youtube_link.save()
+    assert "embed/changed" in provider.get_recording(confirmed_submission)["iframe"]
+    youtube_link.delete()
+    assert provider.get_recording(confirmed_submission) is None
+
+
+@pytest.mark.django_db
+def test_recording_cache_is_invalidated_by_bulk_writes(event, slot, locmem_cache):
+    submission = slot.submission
+    provider = YouTubeProvider(event)
+    assert provider.get_recording(submission) is None
+    with scope(event=event):
+        import_links(event, [(2, {"submission": submission.code, "video_id": "one"})])
+    assert "embed/one" in provider.get_recording(submission)["iframe"]
+    with scope(event=event):
+        form = YouTubeUrlForm(
+            data={f"video_id_{submission.code}": "https://youtu.be/two"}, event=event
+        )
+        assert form.is_valid(), form.errors
+        form.save()
+    assert "embed/two" in provider.get_recording(submission)["iframe"]
+
+
 # -- Form tests --
 
 
@@ -123,6 +294,22 @@ def test_url_form_with_existing_link(event, slot, youtube_link):
     assert field.initial == youtube_link.youtube_link
 
 
+@pytest.mark.django_db
+def test_url_form_query_count_is_constant(
+    event, make_slots, django_assert_num_queries, make_links
+):
+    submissions = make_slots(1000)
+    make_links(submissions[::2])
+    with scope(event=event):
+        event = Event.objects.get(pk=event.pk)
+        # The current schedule, the talks with their submissions, and the links
+        with django_assert_num_queries(3):
+            form = YouTubeUrlForm(event=event)
+            rendered = str(form)
+    assert len(form.fields) == 1000
+    assert submissions[0].urls.public.full() in rendered
+
+
 @pytest.mark.django_db
 @pytest.mark.parametrize(
     ("url", "expected_id"),
@@ -194,6 +381,30 @@ def test_url_form_save_deletes_link(event, slot, youtube_link):
     assert not YouTubeLink.objects.filter(submission=slot.submission).exists()
 
 
+@pytest.mark.django_db
+def test_url_form_save_only_writes_changes(
+    event, make_slots, django_assert_num_queries, make_links
+):
+    submissions = make_slots(300)
+    links = make_links(submissions[:200])
+    data = {f"video_id_{link.submission.code}": link.youtube_link for link in links}
+    data[f"video_id_{submissions[0].code}"] = "https://youtu.be/changed"
+    data[f"video_id_{submissions[1].code}"] = ""
+    data[f"video_id_{submissions[250].code}"] = "https://youtu.be/added"
+    with scope(event=event):
+        form = YouTubeUrlForm(data=data, event=event)
+        assert form.is_valid(), form.errors
+        # One INSERT, one UPDATE, one DELETE and one INSERT for the deletion
+        # record, wrapped in a savepoint
+        with django_assert_num_queries(6):
+            form.save()
+    assert YouTubeLink.objects.filter(submission__event=event).count() == 200
+    assert YouTubeLink.objects.get(submission=submissions[0]).video_id == "changed"
+    assert not YouTubeLink.objects.filter(submission=submissions[1]).exists()
+    assert YouTubeLink.objects.get(submission=submissions[250]).video_id == "added"
+    assert YouTubeLink.objects.get(submission=submissions[2]).video_id == "vid2"
+
+
 # -- View tests --
 
 
@@ -217,21 +428,146 @@ def test_post_manual_url(orga_client, event, slot):
     code = slot.submission.code
     response = orga_client.post(
         url,
-        data={f"video_id_{code}": "https://www.youtube.com/watch?v=test123"},
+        data={
+            "talks": code,
+            f"video_id_{code}": "https://www.youtube.com/watch?v=test123",
+        },
         follow=True,
     )
     assert response.status_code == 200
     assert YouTubeLink.objects.filter(submission__code=code).exists()
 
 
+@pytest.mark.django_db
+def test_settings_paginates_talks(orga_client, event, make_slots):
+    submissions = make_slots(60)
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    response = orga_client.get(url)
+    assert len(response.context["form"].fields) == 50
+    response = orga_client.get(url, {"page": 2})
+    assert list(response.context["form"].fields) == [
+        f"video_id_{submission.code}" for submission in submissions[50:]
+    ]
+
+
+@pytest.mark.django_db
+def test_settings_post_only_touches_current_page(
+    orga_client, event, make_slots, make_links
+):
+    submissions = make_slots(60)
+    make_links(submissions, video_id="keepme")
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    response = orga_client.get(f"{url}?page=2")
+    talks = response.context["talk_codes"]
+    assert talks.split() == [submission.code for submission in submissions[50:]]
+    data = {"talks": talks}
+    data.update((f"video_id_{code}", "") for code in talks.split())
+    response = orga_client.post(f"{url}?page=2", data=data, follow=True)
+    assert response.status_code == 200
+    assert response.redirect_chain[-1][0] == f"{url}?page=2"
+    assert YouTubeLink.objects.filter(submission__event=event).count() == 50
+
+
+@pytest.mark.django_db
+def test_settings_post_ignores_page_size_changed_in_other_tab(
+    orga_client, event, make_slots, make_links
+):
+    submissions = make_slots(120)
+    make_links(submissions, video_id="keepme")
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    response = orga_client.get(f"{url}?page=2")
+    form = response.context["form"]
+    data = {"talks": response.context["talk_codes"]}
+    data.update((name, field.initial) for name, field in form.fields.items())
+    # Another tab switches to a smaller page size, which is kept in the session.
+    orga_client.get(f"{url}?page_size=20")
+
+    response = orga_client.post(f"{url}?page=2", data=data, follow=True)
+    assert response.status_code == 200
+    assert YouTubeLink.objects.filter(event=event, video_id="keepme").count() == 120
+
+
+@pytest.mark.django_db
+def test_url_form_keeps_links_of_missing_fields(event, slot, youtube_link):
+    with scope(event=event):
+        form = YouTubeUrlForm(data={}, event=event)
+        assert form.is_valid()
+        form.save()
+    assert YouTubeLink.objects.filter(pk=youtube_link.pk).exists()
+
+
+@pytest.mark.django_db
+def test_settings_filters_talks(orga_client, event, make_slots, room):
+    submissions = make_slots(4)
+    YouTubeLink.objects.create(submission=submissions[0], video_id="present")
+    with scope(event=event):
+        other_room = Room.objects.create(event=event, name="Other room", position=2)
+        TalkSlot.objects.filter(submission=submissions[1]).update(room=other_room)
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+
+    response = orga_client.get(url, {"missing": "on"})
+    assert len(response.context["form"].fields) == 3
+    response = orga_client.get(url, {"room": other_room.pk})
+    assert list(response.context["form"].fields) == [f"video_id_{submissions[1].code}"]
+    response = orga_client.get(url, {"day": event.date_to.isoformat()})
+    assert len(response.context["form"].fields) == 0
+    response = orga_client.get(url, {"day": event.date_from.isoformat()})
+    assert len(response.context["form"].fields) == 4
+
+
+@pytest.mark.django_db
+def test_settings_export_csv(
+    orga_client, event, make_slots, room, django_assert_num_queries, make_links
+):
+    submissions = make_slots(3)
+    make_links(submissions[:2])
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    response = orga_client.get(url, {"export": "csv"})
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/csv"
+    assert "test-youtube.csv" in response["Content-Disposition"]
+    # All talks in one go, the current schedule was checked before streaming
+    with django_assert_num_queries(1):
+        content = b"".join(response.streaming_content).decode()
+    rows = list(csv.DictReader(io.StringIO(content)))
+    assert [row["submission"] for row in rows] == [s.code for s in submissions[:2]]
+    assert rows[1]["video_id"] == "vid1"
+    assert rows[1]["title"] == submissions[1].title
+    assert rows[1]["room"] == str(room.name)
+    assert rows[1]["start"].startswith(event.date_from.isoformat())
+
+
+@pytest.mark.django_db
+def test_settings_export_json_can_be_imported(orga_client, event, slot, youtube_link):
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    response = orga_client.get(url, {"export": "json"})
+    assert response["Content-Type"] == "application/json"
+    content = b"".join(response.streaming_content)
+    assert json.loads(content)[0]["video_id"] == youtube_link.video_id
+    with scope(event=event):
+        assert import_links(event, iter_json_rows(content)) == (0, 0)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("output", ("csv", "json"))
+def test_settings_export_without_schedule(orga_client, event, output):
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    response = orga_client.get(url, {"export": output}, follow=True)
+    assert response.redirect_chain == [(url, 302)]
+    assert "?export=" not in response.content.decode()
+
+
 @pytest.mark.django_db
 def test_post_invalid_manual_url(orga_client, event, slot):
     url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
     code = slot.submission.code
     response = orga_client.post(
-        url, data={f"video_id_{code}": "https://example.com/notaurl"}, follow=True
+        url,
+        data={"talks": code, f"video_id_{code}": "https://example.com/notaurl"},
+        follow=True,
     )
     assert response.status_code == 200
+    assert response.context["form"].errors
     assert not YouTubeLink.objects.filter(submission__code=code).exists()
 
 
@@ -247,9 +583,19 @@ def test_upload_json_file(orga_client, event, slot):
         url, data={"action": "upload", "file": upload}, follow=True
     )
     assert response.status_code == 200
+    assert not YouTubeLink.objects.filter(submission__code=code).exists()
+    preview = response.context["import_preview"]
+    assert (preview["created"], preview["updated"]) == (1, 0)
+    response = orga_client.post(
+        url,
+        data={"action": "confirm_import", "import_file": preview["file"].pk},
+        follow=True,
+    )
+    assert response.status_code == 200
     assert YouTubeLink.objects.filter(
         submission__code=code, video_id="jsonvid1"
     ).exists()
+    assert not CachedFile.objects.filter(pk=preview["file"].pk).exists()
 
 
 @pytest.mark.django_db
@@ -264,11 +610,105 @@ def test_upload_csv_file(orga_client, event, slot):
         url, data={"action": "upload", "file": upload}, follow=True
     )
     assert response.status_code == 200
+    assert not YouTubeLink.objects.filter(submission__code=code).exists()
+    response = orga_client.post(
+        url,
+        data={
+            "action": "confirm_import",
+            "import_file": response.context["import_preview"]["file"].pk,
+        },
+        follow=True,
+    )
+    assert response.status_code == 200
     assert YouTubeLink.objects.filter(
         submission__code=code, video_id="csvvid1"
     ).exists()
 
 
+@pytest.mark.django_db
+def test_upload_reports_invalid_rows(orga_client, event, slot):
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    code = slot.submission.code
+    csv_content = f"submission,video_id\n{code},csvvid1\nNOPE42,csvvid2\n"
+    upload = SimpleUploadedFile(
+        "data.csv", csv_content.encode(), content_type="text/csv"
+    )
+    response = orga_client.post(
+        url, data={"action": "upload", "file": upload}, follow=True
+    )
+    assert response.status_code == 200
+    assert "import_preview" not in response.context
+    assert response.context["import_errors"] == [
+        {
+            "row": 2,
+            "line": 3,
+            "errors": {"submission": ["Object with code=NOPE42 does not exist."]},
+        }
+    ]
+    assert not YouTubeLink.objects.filter(submission__code=code).exists()
+    assert not CachedFile.objects.exists()
+
+
+@pytest.mark.django_db
+def test_upload_cancel(orga_client, event, slot):
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    csv_content = f"submission,video_id\n{slot.submission.code},csvvid1\n"
+    upload = SimpleUploadedFile(
+        "data.csv", csv_content.encode(), content_type="text/csv"
+    )
+    response = orga_client.post(url, data={"action": "upload", "file": upload})
+    cached_file = response.context["import_preview"]["file"]
+    response = orga_client.post(
+        url,
+        data={"action": "cancel_import", "import_file": cached_file.pk},
+        follow=True,
+    )
+    assert response.status_code == 200
+    assert not CachedFile.objects.filter(pk=cached_file.pk).exists()
+    assert not YouTubeLink.objects.exists()
+
+
+@pytest.mark.django_db
+def test_upload_cannot_be_confirmed_on_other_event(
+    orga_client, event, other_event, slot
+):
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    csv_content = f"submission,video_id\n{slot.submission.code},csvvid1\n"
+    upload = SimpleUploadedFile(
+        "data.csv", csv_content.encode(), content_type="text/csv"
+    )
+    response = orga_client.post(url, data={"action": "upload", "file": upload})
+    cached_file = response.context["import_preview"]["file"]
+
+    with scope(event=other_event):
+        freeze_schedule(other_event.wip_schedule, name="v1")
+    other_url = reverse(SETTINGS_URL_NAME, kwargs={"event": other_event.slug})
+    response = orga_client.post(
+        other_url,
+        data={"action": "confirm_import", "import_file": cached_file.pk},
+        follow=True,
+    )
+    assert response.status_code == 200
+    assert CachedFile.objects.filter(pk=cached_file.pk).exists()
+    assert not YouTubeLink.objects.exists()
+
+    orga_client.post(
+        url, data={"action": "confirm_import", "import_file": cached_file.pk}
+    )
+    assert YouTubeLink.objects.filter(video_id="csvvid1").exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("import_file", ("", "not-a-uuid", str(uuid.uuid4())))
+def test_upload_confirm_unknown_file(orga_client, event, slot, import_file):
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    response = orga_client.post(
+        url, data={"action": "confirm_import", "import_file": import_file}, follow=True
+    )
+    assert response.status_code == 200
+    assert not YouTubeLink.objects.exists()
+
+
 @pytest.mark.django_db
 def test_upload_invalid_file_type(orga_client, event, slot):
     url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
@@ -323,6 +763,303 @@ def test_api_detail(api_client, event, youtube_link):
     assert data["video_id"] == "dQw4w9WgXcQ"
 
 
+@pytest.mark.django_db
+def test_api_list_conditional_get(api_client, event, youtube_link):
+    url = f"/api/events/{event.slug}/p/youtube/"
+    response = api_client.get(url)
+    assert response.status_code == 200
+    etag = response["ETag"]
+    assert response["Last-Modified"]
+
+    with patch.object(YouTubeLinkSerializer, "to_representation") as serialize:
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+    serialize.assert_not_called()
+
+    response = api_client.get(url, {"page": 1}, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+    youtube_link.video_id = "changed"
+    youtube_link.save()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+    etag = response["ETag"]
+
+    youtube_link.delete()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()["count"] == 0
+    assert response["Last-Modified"]
+
+
+@pytest.mark.django_db
+def test_api_list_last_modified_sees_deletions(
+    api_client, event, make_slots, make_links
+):
+    submissions = make_slots(2)
+    make_links(submissions, video_id="vid")
+    YouTubeLink.objects.update(updated=now() - dt.timedelta(hours=1))
+    url = f"/api/events/{event.slug}/p/youtube/"
+    last_modified = api_client.get(url)["Last-Modified"]
+
+    YouTubeLink.objects.get(submission=submissions[0]).delete()
+    response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == 200
+    assert response.json()["count"] == 1
+    assert response["Last-Modified"] != last_modified
+
+
+@pytest.mark.django_db
+def test_api_detail_conditional_get(api_client, event, youtube_link):
+    url = f"/api/events/{event.slug}/p/youtube/{youtube_link.submission.code}/"
+    response = api_client.get(url)
+    assert response.status_code == 200
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert response.status_code == 304
+    response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_api_conditional_get_sees_bulk_updates(api_client, event, youtube_link):
+    url = f"/api/events/{event.slug}/p/youtube/"
+    etag = api_client.get(url)["ETag"]
+    code = youtube_link.submission.code
+    with scope(event=event):
+        import_links(event, [(2, {"submission": code, "video_id": "imported"})])
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()["results"][0]["video_id"] == "imported"
+
+
+@pytest.mark.django_db
+def test_api_list_cursor_pagination(api_client, event, make_slots, make_links):
+    submissions = make_slots(5)
+    make_links(submissions)
+    url = f"/api/events/{event.slug}/p/youtube/?pagination=cursor&page_size=2"
+    codes = []
+    with CaptureQueriesContext(connection) as queries:
+        while url:
+            data = api_client.get(url).json()
+            assert "count" not in data
+            codes += [link["submission"] for link in data["results"]]
+            url = data["next"]
+    assert codes == sorted(submission.code for submission in submissions)
+    # Only the ETag lookup counts, page number pagination would add a COUNT(*)
+    assert not any("COUNT(*)" in query["sql"] for query in queries)
+
+
+@pytest.mark.django_db
+def test_api_list_cursor_pagination_ignores_ordering(
+    api_client, event, make_slots, make_links
+):
+    submissions = make_slots(3)
+    make_links(submissions)
+    url = f"/api/events/{event.slug}/p/youtube/"
+    response = api_client.get(url, {"pagination": "cursor", "o": "-submission"})
+    assert response.status_code == 200
+    assert [link["submission"] for link in response.json()["results"]] == sorted(
+        submission.code for submission in submissions
+    )
+
+
+EXPORT_URL = "/api/organisers/{organiser}/p/youtube/export/"
+
+
+@pytest.fixture
+def export_links(event, other_event, youtube_link):
+    with scope(event=other_event):
+        submission = Submission.objects.create(
+            title="Other Talk",
+            submission_type=other_event.cfp.default_type,
+            event=other_event,
+            content_locale="en",
+        )
+    other_link = YouTubeLink.objects.create(submission=submission, video_id="other")
+    return [youtube_link, other_link]
+
+
+@pytest.mark.django_db
+def test_api_export_ndjson(api_client, event, export_links, django_assert_num_queries):
+    response = api_client.get(EXPORT_URL.format(organiser=event.organiser.slug))
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/x-ndjson"
+    with django_assert_num_queries(1):
+        content = b"".join(response.streaming_content).decode()
+    rows = [json.loads(line) for line in content.splitlines()]
+    assert rows == [
+        {
+            "event": link.submission.event.slug,
+            "submission": link.submission.code,
+            "video_id": link.video_id,
+            "youtube_link": link.youtube_link,
+        }
+        for link in sorted(export_links, key=lambda link: link.submission.event.slug)
+    ]
+
+
+@pytest.mark.django_db
+def test_api_export_csv_skips_disabled_events(
+    api_client, event, other_event, export_links
+):
+    other_event.plugins = ""
+    other_event.save()
+    response = api_client.get(
+        EXPORT_URL.format(organiser=event.organiser.slug), {"output": "csv"}
+    )
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/csv"
+    content = b"".join(response.streaming_content).decode()
+    link = export_links[0]
+    assert content.splitlines() == [
+        "event,submission,video_id,youtube_link",
+        f"{event.slug},{link.submission.code},{link.video_id},{link.youtube_link}",
+    ]
+
+
+@pytest.mark.django_db
+def test_api_export_rejects_unknown_format_and_anonymous_users(
+    api_client, client, event
+):
+    url = EXPORT_URL.format(organiser=event.organiser.slug)
+    assert api_client.get(url, {"output": "xml"}).status_code == 400
+    assert client.get(url).status_code in (401, 403)
+
+
+@pytest.fixture
+def api_token(orga_user, event):
+    """A token with read access to every endpoint pretalx offers, for ``event``."""
+    with scopes_disabled():
+        token = UserApiToken.objects.create(
+            user=orga_user,
+            name="Read everything",
+            endpoints={endpoint: ["list", "retrieve"] for endpoint in ENDPOINTS},
+        )
+        token.events.add(event)
+    return token
+
+
+@pytest.mark.django_db
+def test_api_export_needs_endpoint_permission(event, export_links, api_token):
+    client = APIClient(HTTP_AUTHORIZATION=f"Token {api_token.token}")
+    # Tokens can't be granted this plugin's endpoints, so the export is as
+    # closed to them as the per-event endpoint.
+    assert client.get(f"/api/events/{event.slug}/p/youtube/").status_code == 403
+    response = client.get(EXPORT_URL.format(organiser=event.organiser.slug))
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_api_export_events_follow_token(
+    event, other_event, schedule, review_user, api_token, rf
+):
+    view = YouTubeLinkExportView()
+    view.request = rf.get("/")
+    view.request.organiser = event.organiser
+    view.request.user = api_token.user
+    view.request.auth = api_token
+    with scopes_disabled():
+        assert view.get_events() == [event]
+
+        view.request.user = review_user
+        phase = event.active_review_phase
+        phase.can_see_speaker_names = False
+        phase.save()
+        assert view.get_events() == []
+        phase.can_see_speaker_names = True
+        phase.save()
+        assert view.get_events() == [event]
+
+
+@pytest.mark.django_db
+def test_api_changes_requires_changed_since(api_client, event):
+    url = f"/api/events/{event.slug}/p/youtube/changes/"
+    response = api_client.get(url)
+    assert response.status_code == 400
+    assert "changed_since" in response.json()
+    response = api_client.get(url, {"changed_since": "yesterday"})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_api_changes_lists_changes_and_deletions(
+    api_client, event, make_slots, django_assert_max_num_queries, make_links
+):
+    url = f"/api/events/{event.slug}/p/youtube/changes/"
+    submissions = make_slots(4)
+    links = make_links(submissions)
+    last_sync = now() - dt.timedelta(hours=1)
+    YouTubeLink.objects.filter(pk__in=[link.pk for link in links]).update(
+        updated=last_sync - dt.timedelta(hours=1)
+    )
+
+    response = api_client.get(url, {"changed_since": last_sync.isoformat()})
+    assert response.status_code == 200
+    assert response.json()["changed"] == []
+    assert response.json()["deleted"] == []
+
+    links[0].video_id = "changed"
+    links[0].save()
+    links[1].delete()
+    links[2].delete()
+    YouTubeLink.objects.create(submission=submissions[2], video_id="readded")
+    with django_assert_max_num_queries(10):
+        response = api_client.get(url, {"changed_since": last_sync.isoformat()})
+    data = response.json()
+    assert [link["submission"] for link in data["changed"]] == [
+        submissions[0].code,
+        submissions[2].code,
+    ]
+    assert data["deleted"] == [submissions[1].code]
+
+    # Recent changes are listed again, as their transactions may not have
+    # been committed when they were first listed.
+    response = api_client.get(url, {"changed_since": data["synced_at"]})
+    assert response.json()["changed"] == data["changed"]
+    assert response.json()["deleted"] == data["deleted"]
+
+    YouTubeLink.objects.update(updated=last_sync)
+    YouTubeLinkDeletion.objects.update(deleted=last_sync)
+    synced_at = api_client.get(url, {"changed_since": last_sync.isoformat()}).json()[
+        "synced_at"
+    ]
+    response = api_client.get(url, {"changed_since": synced_at})
+    assert response.json() == {
+        "changed": [],
+        "deleted": [],
+        "synced_at": response.json()["synced_at"],
+    }
+
+
+@pytest.mark.django_db
+def test_api_changes_sees_late_commits(api_client, event, youtube_link):
+    url = f"/api/events/{event.slug}/p/youtube/changes/"
+    started = now()
+    synced_at = api_client.get(url, {"changed_since": started.isoformat()}).json()[
+        "synced_at"
+    ]
+    # A write whose transaction began before the sync, but committed after it
+    YouTubeLink.objects.filter(pk=youtube_link.pk).update(
+        video_id="late", updated=started - dt.timedelta(seconds=30)
+    )
+    response = api_client.get(url, {"changed_since": synced_at})
+    assert [link["video_id"] for link in response.json()["changed"]] == ["late"]
+
+
+@pytest.mark.django_db
+def test_url_form_save_records_deletions(event, slot, youtube_link):
+    code = slot.submission.code
+    with scope(event=event):
+        form = YouTubeUrlForm(data={f"video_id_{code}": ""}, event=event)
+        assert form.is_valid(), form.errors
+        form.save()
+    assert list(
+        event.youtube_link_deletions.values_list("submission_code", flat=True)
+    ) == [code]
+
+
 @pytest.mark.django_db
 def test_api_create(api_client, event, confirmed_submission):
     response = api_client.post(
@@ -332,7 +1069,7 @@ def test_api_create(api_client, event, confirmed_submission):
     )
     assert response.status_code == 201
     assert YouTubeLink.objects.filter(
-        submission=confirmed_submission, video_id="newvid123"
+        submission=confirmed_submission, event=event, video_id="newvid123"
     ).exists()
 
 
@@ -443,6 +1180,260 @@ def test_api_bulk_import_csv_file(api_client, event, confirmed_submission):
     ).exists()
 
 
+@pytest.mark.django_db
+def test_api_bulk_import_upserts(api_client, event, confirmed_submission, youtube_link):
+    with scope(event=event):
+        other = Submission.objects.create(
+            title="Other Talk",
+            submission_type=confirmed_submission.submission_type,
+            event=event,
+        )
+    data = [
+        {"submission": confirmed_submission.code, "video_id": "first"},
+        {"submission": other.code, "video_id": "newvid"},
+        {"submission": confirmed_submission.code, "video_id": "second"},
+    ]
+    response = api_client.post(
+        f"/api/events/{event.slug}/p/youtube/import/", data=data, format="json"
+    )
+    assert response.status_code == 201
+    assert YouTubeLink.objects.filter(submission__event=event).count() == 2
+    youtube_link.refresh_from_db()
+    assert youtube_link.video_id == "second"
+    assert YouTubeLink.objects.get(submission=other).video_id == "newvid"
+
+
+@pytest.mark.django_db
+def test_api_bulk_import_reports_row_errors(api_client, event, confirmed_submission):
+    data = [
+        {"submission": confirmed_submission.code, "video_id": "validvid"},
+        {"submission": "NOPE42", "video_id": "validvid"},
+        {"submission": confirmed_submission.code, "video_id": "not valid!"},
+    ]
+    response = api_client.post(
+        f"/api/events/{event.slug}/p/youtube/import/", data=data, format="json"
+    )
+    assert response.status_code == 400
+    assert response.data == [
+        {
+            "row": 2,
+            "line": 1,
+            "errors": {"submission": ["Object with code=NOPE42 does not exist."]},
+        },
+        {
+            "row": 3,
+            "line": 1,
+            "errors": {"video_id": ["This is not a valid YouTube video id."]},
+        },
+    ]
+    assert not YouTubeLink.objects.filter(submission=confirmed_submission).exists()
+
+
+def test_normalise_video_ids():
+    video_ids, errors = normalise_video_ids(
+        [
+            "abcDEF12345",
+            "https://www.youtube.com/watch?v=abcDEF12345&t=1",
+            "https://youtu.be/abcDEF12345",
+            "be/abc123",
+            "not valid!",
+            "a" * 21,
+            "https://www.youtube.com/embed/" + "a" * 21,
+            "",
+        ]
+    )
+    assert video_ids == [
+        "abcDEF12345",
+        "abcDEF12345",
+        "abcDEF12345",
+        "abc123",
+        None,
+        None,
+        None,
+        None,
+    ]
+    assert errors == dict.fromkeys(
+        (4, 5, 6, 7), "This is not a valid YouTube video id."
+    )
+
+
+@pytest.mark.django_db
+def test_import_links_normalises_urls(event, confirmed_submission):
+    data = (
+        "submission,video_id\n"
+        f"{confirmed_submission.code},https://www.youtube.com/watch?v=abcDEF12345\n"
+    )
+    with scope(event=event):
+        assert import_links(event, iter_csv_rows(data)) == (1, 0)
+        link = YouTubeLink.objects.get(submission=confirmed_submission)
+    assert link.video_id == "abcDEF12345"
+
+
+@pytest.mark.django_db
+def test_api_bulk_import_reports_malformed_rows(
+    api_client, event, confirmed_submission
+):
+    data = [
+        {"submission": confirmed_submission.code, "video_id": 12345},
+        {"submission": confirmed_submission.code, "video_id": " "},
+        {"submission": confirmed_submission.code, "video_id": "a" * 21},
+        "not a row",
+    ]
+    response = api_client.post(
+        f"/api/events/{event.slug}/p/youtube/import/", data=data, format="json"
+    )
+    assert response.status_code == 400
+    assert [error["row"] for error in response.data] == [2, 3, 4]
+    assert response.data[0]["errors"] == {"video_id": ["This field may not be blank."]}
+    assert response.data[1]["errors"] == {
+        "video_id": ["This is not a valid YouTube video id."]
+    }
+    assert "non_field_errors" in response.data[2]["errors"]
+
+
+@pytest.mark.django_db
+def test_api_create_accepts_watch_url(api_client, event, confirmed_submission):
+    response = api_client.post(
+        f"/api/events/{event.slug}/p/youtube/",
+        data={
+            "submission": confirmed_submission.code,
+            "video_id": "https://www.youtube.com/watch?v=abcDEF12345",
+        },
+        format="json",
+    )
+    assert response.status_code == 201
+    link = YouTubeLink.objects.get(submission=confirmed_submission)
+    assert link.video_id == "abcDEF12345"
+
+
+@pytest.mark.django_db
+def test_api_bulk_import_dry_run(api_client, event, confirmed_submission):
+    data = [{"submission": confirmed_submission.code, "video_id": "dryvid"}]
+    response = api_client.post(
+        f"/api/events/{event.slug}/p/youtube/import/?dry_run=1",
+        data=data,
+        format="json",
+    )
+    assert response.status_code == 200
+    assert response.data == {"created": 1, "updated": 0}
+    assert not YouTubeLink.objects.filter(submission=confirmed_submission).exists()
+
+
+@pytest.mark.django_db
+def test_import_links_query_count(
+    event, confirmed_submission, django_assert_num_queries
+):
+    with scope(event=event):
+        submissions = [confirmed_submission] + [
+            Submission.objects.create(
+                title=f"Talk {i}",
+                submission_type=confirmed_submission.submission_type,
+                event=event,
+            )
+            for i in range(20)
+        ]
+        YouTubeLink.objects.create(submission=submissions[1], video_id="old")
+        rows = [
+            (i, {"submission": submission.code, "video_id": f"vid{i}"})
+            for i, submission in enumerate(submissions)
+        ]
+        # Resolve codes, load links, then one bulk INSERT and one bulk UPDATE
+        # inside a savepoint.
+        with django_assert_num_queries(6):
+            created, updated = import_links(event, rows)
+    assert (created, updated) == (20, 1)
+
+
+@pytest.mark.django_db
+def test_api_bulk_import_invalid_json(api_client, event):
+    response = api_client.post(
+        f"/api/events/{event.slug}/p/youtube/import/",
+        data=b'[{"submission": "X"',
+        content_type="application/json",
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_api_bulk_import_csv_upload(api_client, event, confirmed_submission):
+    response = api_client.post(
+        f"/api/events/{event.slug}/p/youtube/import/",
+        data=f"submission,video_id\n{confirmed_submission.code},uploadvid\n".encode(),
+        content_type="text/csv",
+        HTTP_CONTENT_DISPOSITION="attachment; filename=links.csv",
+    )
+    assert response.status_code == 201
+    assert YouTubeLink.objects.get(submission=confirmed_submission).video_id == (
+        "uploadvid"
+    )
+
+
+@pytest.mark.django_db
+def test_import_links_in_batches(event, confirmed_submission):
+    with scope(event=event):
+        rows = [
+            (i, {"submission": confirmed_submission.code, "video_id": f"vid{i}"})
+            for i in range(5)
+        ]
+        created, updated = import_links(event, rows, batch_size=2)
+    assert (created, updated) == (1, 2)
+    assert YouTubeLink.objects.get(submission=confirmed_submission).video_id == "vid4"
+
+
+@pytest.mark.django_db
+def test_import_links_rolls_back_earlier_batches(event, confirmed_submission):
+    rows = [
+        (1, {"submission": confirmed_submission.code, "video_id": "validvid"}),
+        (2, {"submission": confirmed_submission.code, "video_id": "not valid!"}),
+    ]
+    with scope(event=event), pytest.raises(ImportValidationError) as excinfo:
+        import_links(event, rows, batch_size=1)
+    assert [error["row"] for error in excinfo.value.errors] == [2]
+    assert not YouTubeLink.objects.filter(submission=confirmed_submission).exists()
+
+
+@pytest.mark.parametrize("chunk_size", (1, 7, 64 * 1024))
+def test_iter_json_rows_across_chunks(monkeypatch, chunk_size):
+    monkeypatch.setattr("pretalx_youtube.importer.CHUNK_SIZE", chunk_size)
+    data = b' [ {"submission": "ABC", "video_id": "x\\u00e9"},\n{"n": 12345} , [] ]\n'
+    assert list(iter_json_rows(io.BytesIO(data))) == [
+        (1, {"submission": "ABC", "video_id": "x\u00e9"}),
+        (2, {"n": 12345}),
+        (2, []),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", (1, 2, 3))
+def test_iter_json_rows_numbers_across_chunks(monkeypatch, chunk_size):
+    monkeypatch.setattr("pretalx_youtube.importer.CHUNK_SIZE", chunk_size)
+    data = b"[1e5,2.25,-3,4E-2,67]"
+    assert [row for _line, row in iter_json_rows(io.BytesIO(data))] == [
+        1e5,
+        2.25,
+        -3,
+        4e-2,
+        67,
+    ]
+
+
+@pytest.mark.parametrize(
+    "data", (b"", b"{}", b"[1 2]", b"[1,", b"[1] 2", b'[{"a": 1}', b"\xff[]")
+)
+def test_iter_json_rows_rejects_malformed(data):
+    with pytest.raises(ImportFormatError):
+        list(iter_json_rows(io.BytesIO(data)))
+
+
+@pytest.mark.parametrize("chunk_size", (1, 5, 64 * 1024))
+def test_iter_csv_rows_across_chunks(monkeypatch, chunk_size):
+    monkeypatch.setattr("pretalx_youtube.importer.CHUNK_SIZE", chunk_size)
+    data = '\ufeffsubmission,video_id\r\nABC,"multi\nline"\n,\nDEF,vid2'.encode()
+    assert list(iter_csv_rows(io.BytesIO(data))) == [
+        (3, {"submission": "ABC", "video_id": "multi\nline"}),
+        (5, {"submission": "DEF", "video_id": "vid2"}),
+    ]
+
+
 @pytest.mark.django_db
 def test_api_serializer_without_context():
     serializer = YouTubeLinkSerializer()
@@ -511,11 +1502,6 @@ VALID_VIDEO_URL = "https://www.youtube.com/watch?v=abcDEF12345"
 VALID_VIDEO_ID = "abcDEF12345"
 
 
-@pytest.fixture
-def webhook_settings(event):
-    return YouTubeWebhookSettings.objects.create(event=event, token="secret-token-xyz")
-
-
 def _payload(event, submission, *, enabled=True, urls=None, conference=None):
     return {
         "announcement": None,
@@ -723,7 +1709,7 @@ def test_webhook_rejects_non_object_payload(client, event, webhook_settings):
     url = reverse(WEBHOOK_URL_NAME, kwargs={"event": event.slug})
     response = client.post(
         url,
-        data=json.dumps([1, 2, 3]),
+        data=json.dumps("payload"),
         content_type="application/json",
         HTTP_AUTHORIZATION=webhook_settings.token,
     )
@@ -858,21 +1844,121 @@ def test_settings_page_shows_webhook_config(orga_client, event):
     url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
     response = orga_client.get(url)
     assert response.status_code == 200
-    # Webhook settings should be auto-created
+    # Webhook settings should be auto-created, and the token shown once
     settings = YouTubeWebhookSettings.objects.get(event=event)
-    assert settings.token
-    assert settings.token.encode() in response.content
+    token = response.context["webhook_token"]
+    assert hash_webhook_token(token) == settings.token_hash
+    assert token.encode() in response.content
+    assert token not in settings.token_hash
+
+    response = orga_client.get(url)
+    assert response.context["webhook_token"] is None
+    assert token.encode() not in response.content
 
 
 @pytest.mark.django_db
 def test_settings_rotate_token(orga_client, event):
     url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
     orga_client.get(url)  # auto-create
-    original = YouTubeWebhookSettings.objects.get(event=event).token
+    original = YouTubeWebhookSettings.objects.get(event=event).token_hash
     response = orga_client.post(url, data={"action": "rotate_token"}, follow=True)
     assert response.status_code == 200
-    new_token = YouTubeWebhookSettings.objects.get(event=event).token
-    assert new_token != original
+    token = response.context["webhook_token"]
+    new_hash = YouTubeWebhookSettings.objects.get(event=event).token_hash
+    assert new_hash != original
+    assert hash_webhook_token(token) == new_hash
+    assert orga_client.get(url).context["webhook_token"] is None
+
+
+@pytest.mark.django_db
+def test_webhook_authenticates_from_cache(
+    client, event, webhook_settings, confirmed_submission, locmem_cache
+):
+    payload = _payload(event, confirmed_submission, enabled=False)
+    assert _post_webhook(client, event, payload, token="nope").status_code == 403
+    with CaptureQueriesContext(connection) as ctx:
+        response = _post_webhook(client, event, payload, token="nope")
+        assert response.status_code == 403
+        response = _post_webhook(client, event, payload, token=webhook_settings.token)
+        assert response.status_code == 204
+    assert not any("youtubewebhooksettings" in q["sql"] for q in ctx.captured_queries)
+    assert "secret-token-xyz" not in str(
+        locmem_cache.get(webhook_settings_cache_key(event.pk))
+    )
+
+    # Rotating the token takes effect right away
+    webhook_settings.set_token()
+    webhook_settings.save()
+    response = _post_webhook(client, event, payload, token="secret-token-xyz")
+    assert response.status_code == 403
+    response = _post_webhook(client, event, payload, token=webhook_settings.token)
+    assert response.status_code == 204
+
+
+@pytest.mark.django_db
+def test_webhook_is_rate_limited(
+    client, event, webhook_settings, confirmed_submission, locmem_cache, monkeypatch
+):
+    (client_bucket,) = WEBHOOK_CLIENT_BUCKETS
+    (event_bucket,) = WEBHOOK_EVENT_BUCKETS
+    monkeypatch.setattr(client_bucket, "capacity", 2)
+    monkeypatch.setattr(event_bucket, "capacity", 3)
+    clock = MagicMock()
+    clock.time.return_value = 1000
+    monkeypatch.setattr("pretalx_youtube.throttling.time", clock)
+    payload = _payload(event, confirmed_submission, enabled=False)
+
+    def post(ip):
+        url = reverse(WEBHOOK_URL_NAME, kwargs={"event": event.slug})
+        return client.post(
+            url,
+            data=json.dumps(payload),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=webhook_settings.token,
+            REMOTE_ADDR=ip,
+        )
+
+    assert post("192.0.2.1").status_code == 204
+    assert post("192.0.2.1").status_code == 204
+    response = post("192.0.2.1")
+    assert response.status_code == 429
+    assert response["Retry-After"] == str(math.ceil(1 / client_bucket.rate))
+    # Other clients can go on until the event's bucket is empty, too
+    assert post("192.0.2.2").status_code == 204
+    assert post("192.0.2.2").status_code == 429
+
+    clock.time.return_value += 1 / event_bucket.rate
+    assert post("192.0.2.3").status_code == 204
+
+
+@pytest.mark.django_db
+def test_webhook_unauthenticated_requests_keep_event_tokens(
+    client, event, webhook_settings, confirmed_submission, locmem_cache, monkeypatch
+):
+    (event_bucket,) = WEBHOOK_EVENT_BUCKETS
+    monkeypatch.setattr(event_bucket, "capacity", 2)
+    payload = _payload(event, confirmed_submission, enabled=False)
+    for _ in range(5):
+        response = _post_webhook(client, event, payload, token="wrong")
+        assert response.status_code == 403
+    response = _post_webhook(client, event, payload, token=webhook_settings.token)
+    assert response.status_code == 204
+
+
+@pytest.mark.django_db
+def test_api_bulk_import_is_rate_limited(
+    api_client, event, confirmed_submission, locmem_cache, monkeypatch
+):
+    monkeypatch.setattr(IMPORT_BUCKETS[1], "capacity", 1)
+    url = f"/api/events/{event.slug}/p/youtube/import/"
+    data = [{"submission": confirmed_submission.code, "video_id": VALID_VIDEO_ID}]
+    assert api_client.post(url, data=data, format="json").status_code == 201
+    response = api_client.post(url, data=data, format="json")
+    assert response.status_code == 429
+    assert response["Retry-After"] == str(math.ceil(1 / IMPORT_BUCKETS[1].rate))
+    # Reading is not limited
+    response = api_client.get(f"/api/events/{event.slug}/p/youtube/")
+    assert response.status_code == 200
 
 
 @pytest.mark.django_db
@@ -884,6 +1970,383 @@ def test_settings_rotate_creates_settings_if_missing(orga_client, event):
     assert YouTubeWebhookSettings.objects.filter(event=event).exists()
 
 
+@pytest.mark.django_db
+def test_settings_toggle_async_webhook(orga_client, event, webhook_settings):
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    orga_client.post(url, data={"action": "toggle_async_webhook"}, follow=True)
+    webhook_settings.refresh_from_db()
+    assert webhook_settings.process_async
+    orga_client.post(url, data={"action": "toggle_async_webhook"}, follow=True)
+    webhook_settings.refresh_from_db()
+    assert not webhook_settings.process_async
+
+
+@pytest.mark.django_db
+def test_webhook_async_stores_and_applies_payload(
+    client,
+    event,
+    webhook_settings,
+    confirmed_submission,
+    django_capture_on_commit_callbacks,
+):
+    webhook_settings.process_async = True
+    webhook_settings.save()
+    with django_capture_on_commit_callbacks() as callbacks:
+        response = _post_webhook(
+            client,
+            event,
+            _payload(event, confirmed_submission),
+            token=webhook_settings.token,
+        )
+    assert response.status_code == 202
+    delivery = YouTubeWebhookDelivery.objects.get(event=event)
+    assert delivery.video_id == VALID_VIDEO_ID
+    assert not delivery.processed
+    assert not YouTubeLink.objects.filter(submission=confirmed_submission).exists()
+
+    # Runs the task, synchronously as Celery is not configured in tests
+    for callback in callbacks:
+        callback()
+    delivery.refresh_from_db()
+    assert delivery.processed
+    assert delivery.submission == confirmed_submission
+    link = YouTubeLink.objects.get(submission=confirmed_submission)
+    assert link.video_id == VALID_VIDEO_ID
+
+    # Deliveries are only ever applied once
+    link.delete()
+    task_process_webhook_deliveries(deliveries=[delivery.pk])
+    assert not YouTubeLink.objects.filter(submission=confirmed_submission).exists()
+
+
+@pytest.mark.django_db
+def test_webhook_async_records_unmatched_payload(
+    client,
+    event,
+    webhook_settings,
+    confirmed_submission,
+    django_capture_on_commit_callbacks,
+):
+    webhook_settings.process_async = True
+    webhook_settings.save()
+    payload = _payload(event, confirmed_submission)
+    payload["fahrplan"]["id"] = payload["fahrplan"]["slug"] = None
+    with django_capture_on_commit_callbacks(execute=True):
+        response = _post_webhook(client, event, payload, token=webhook_settings.token)
+    assert response.status_code == 202
+    delivery = YouTubeWebhookDelivery.objects.get(event=event)
+    assert delivery.processed
+    assert delivery.submission is None
+
+
+@pytest.mark.django_db
+def test_webhook_async_still_validates_payload(
+    client, event, webhook_settings, confirmed_submission
+):
+    webhook_settings.process_async = True
+    webhook_settings.save()
+    response = _post_webhook(
+        client,
+        event,
+        _payload(event, confirmed_submission, urls=["https://example.com/"]),
+        token=webhook_settings.token,
+    )
+    assert response.status_code == 400
+    assert not YouTubeWebhookDelivery.objects.exists()
+
+
+@pytest.mark.django_db
+def test_webhook_logs_deliveries_and_skips_duplicates(
+    client, event, webhook_settings, confirmed_submission
+):
+    payload = _payload(event, confirmed_submission)
+    response = _post_webhook(client, event, payload, token=webhook_settings.token)
+    assert response.status_code == 204
+    delivery = YouTubeWebhookDelivery.objects.get(event=event)
+    assert delivery.status == YouTubeWebhookDelivery.Status.APPLIED
+    assert delivery.submission == confirmed_submission
+    assert delivery.payload_hash == YouTubeWebhookDelivery.hash_payload(payload)
+    assert delivery.processed >= delivery.received
+
+    with patch("pretalx_youtube.views.process_deliveries") as process_deliveries:
+        response = _post_webhook(client, event, payload, token=webhook_settings.token)
+    assert response.status_code == 204
+    process_deliveries.assert_not_called()
+    assert YouTubeWebhookDelivery.objects.filter(event=event).count() == 1
+
+
+def _post_webhook_batch(client, event, payloads, token, *, ndjson=False):
+    url = reverse(WEBHOOK_URL_NAME, kwargs={"event": event.slug})
+    if ndjson:
+        data = "".join(json.dumps(payload) + "\n" for payload in payloads)
+        content_type = "application/x-ndjson"
+    else:
+        data = json.dumps(payloads)
+        content_type = "application/json"
+    return client.post(
+        url, data=data, content_type=content_type, HTTP_AUTHORIZATION=token
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("ndjson", (False, True))
+def test_webhook_batch_reports_status_per_item(
+    client, event, webhook_settings, make_slots, ndjson
+):
+    submissions = make_slots(2)
+    missing = _payload(event, submissions[0])
+    missing["fahrplan"].update(id=None, slug=None)
+    payloads = [
+        _payload(event, submissions[0]),
+        _payload(event, submissions[1], urls=["https://youtu.be/zyxWVU98765"]),
+        missing,
+        _payload(event, submissions[1], enabled=False),
+        _payload(event, submissions[1], urls=["https://example.com/"]),
+        "payload",
+    ]
+    response = _post_webhook_batch(
+        client, event, payloads, webhook_settings.token, ndjson=ndjson
+    )
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"status": "applied", "submission": submissions[0].code},
+        {"status": "applied", "submission": submissions[1].code},
+        {"status": "unmatched"},
+        {"status": "skipped"},
+        {"status": "invalid", "error": "no valid youtube url"},
+        {"status": "invalid", "error": "invalid payload"},
+    ]
+    with scope(event=event):
+        assert YouTubeLink.objects.get(submission=submissions[0]).video_id == (
+            VALID_VIDEO_ID
+        )
+        assert YouTubeLink.objects.get(submission=submissions[1]).video_id == (
+            "zyxWVU98765"
+        )
+    assert YouTubeWebhookDelivery.objects.filter(event=event).count() == 3
+
+    # Resending the batch reports the same outcome without applying anything
+    with patch("pretalx_youtube.webhooks.write_links") as write_links:
+        response = _post_webhook_batch(
+            client, event, payloads, webhook_settings.token, ndjson=ndjson
+        )
+    write_links.assert_not_called()
+    assert [result["status"] for result in response.json()["results"]] == [
+        "applied",
+        "applied",
+        "unmatched",
+        "skipped",
+        "invalid",
+        "invalid",
+    ]
+    assert YouTubeWebhookDelivery.objects.filter(event=event).count() == 3
+
+
+@pytest.mark.django_db
+def test_webhook_batch_query_count_is_constant(
+    client, event, webhook_settings, make_slots
+):
+    submissions = make_slots(6)
+    token = webhook_settings.token
+
+    def post(submissions):
+        payloads = [_payload(event, submission) for submission in submissions]
+        with CaptureQueriesContext(connection) as ctx:
+            response = _post_webhook_batch(client, event, payloads, token)
+        assert response.status_code == 200
+        return len(ctx)
+
+    assert post(submissions[:2]) == post(submissions[2:])
+
+
+@pytest.mark.django_db
+def test_webhook_batch_async(
+    client,
+    event,
+    webhook_settings,
+    confirmed_submission,
+    django_capture_on_commit_callbacks,
+):
+    webhook_settings.process_async = True
+    webhook_settings.save()
+    with django_capture_on_commit_callbacks() as callbacks:
+        response = _post_webhook_batch(
+            client,
+            event,
+            [_payload(event, confirmed_submission)],
+            webhook_settings.token,
+        )
+    assert response.json()["results"] == [{"status": "pending"}]
+    assert len(callbacks) == 1
+    callbacks[0]()
+    delivery = YouTubeWebhookDelivery.objects.get(event=event)
+    assert delivery.status == YouTubeWebhookDelivery.Status.APPLIED
+    with scope(event=event):
+        assert YouTubeLink.objects.filter(submission=confirmed_submission).exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("process_async", (False, True))
+def test_webhook_batch_rejects_malformed_fahrplan(
+    client,
+    event,
+    webhook_settings,
+    confirmed_submission,
+    django_capture_on_commit_callbacks,
+    process_async,
+):
+    webhook_settings.process_async = process_async
+    webhook_settings.save()
+    not_a_dict = _payload(event, confirmed_submission)
+    not_a_dict["fahrplan"] = "x"
+    bool_id = _payload(event, confirmed_submission)
+    bool_id["fahrplan"]["id"] = True
+    with django_capture_on_commit_callbacks(execute=True):
+        response = _post_webhook_batch(
+            client,
+            event,
+            [_payload(event, confirmed_submission), not_a_dict, bool_id],
+            webhook_settings.token,
+        )
+    assert response.status_code == 200
+    assert response.json()["results"][1:] == [
+        {"status": "invalid", "error": "invalid fahrplan"},
+        {"status": "invalid", "error": "invalid fahrplan id"},
+    ]
+    delivery = YouTubeWebhookDelivery.objects.get(event=event)
+    assert delivery.status == YouTubeWebhookDelivery.Status.APPLIED
+
+
+@pytest.mark.django_db
+def test_process_deliveries_skips_stored_malformed_fahrplan(
+    event, confirmed_submission
+):
+    payload = _payload(event, confirmed_submission)
+    payload["fahrplan"] = "x"
+    delivery = YouTubeWebhookDelivery.objects.create(
+        event=event, payload=payload, payload_hash="old", video_id=VALID_VIDEO_ID
+    )
+    with scope(event=event):
+        process_deliveries(event, [delivery])
+    assert delivery.status == YouTubeWebhookDelivery.Status.UNMATCHED
+
+
+@pytest.fixture
+def unmatched_delivery(client, event, webhook_settings, confirmed_submission):
+    """A delivery for a submission that does not exist (yet)."""
+    payload = _payload(event, confirmed_submission)
+    missing_pk = confirmed_submission.pk + 1000
+    payload["fahrplan"].update(id=missing_pk, slug=f"{event.slug}-{missing_pk}")
+    response = _post_webhook(client, event, payload, token=webhook_settings.token)
+    assert response.status_code == 404
+    delivery = YouTubeWebhookDelivery.objects.get(event=event)
+    assert delivery.status == YouTubeWebhookDelivery.Status.UNMATCHED
+    with scope(event=event):
+        Submission.objects.create(
+            pk=missing_pk,
+            title="Late Talk",
+            submission_type=confirmed_submission.submission_type,
+            event=event,
+            content_locale="en",
+        )
+    return delivery
+
+
+@pytest.mark.django_db
+def test_webhook_retries_unmatched_deliveries(
+    client, event, webhook_settings, unmatched_delivery
+):
+    response = _post_webhook(
+        client, event, unmatched_delivery.payload, token=webhook_settings.token
+    )
+    assert response.status_code == 204
+    unmatched_delivery.refresh_from_db()
+    assert unmatched_delivery.status == YouTubeWebhookDelivery.Status.APPLIED
+
+
+@pytest.mark.django_db
+def test_webhook_async_retries_stale_pending_deliveries(
+    client,
+    event,
+    webhook_settings,
+    confirmed_submission,
+    django_capture_on_commit_callbacks,
+):
+    webhook_settings.process_async = True
+    webhook_settings.save()
+    payload = _payload(event, confirmed_submission)
+    # The task of the first delivery is lost.
+    with django_capture_on_commit_callbacks() as callbacks:
+        _post_webhook(client, event, payload, token=webhook_settings.token)
+    assert len(callbacks) == 1
+    delivery = YouTubeWebhookDelivery.objects.get(event=event)
+    assert delivery.status == YouTubeWebhookDelivery.Status.PENDING
+
+    # Within the grace period, the task may still run.
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        response = _post_webhook(client, event, payload, token=webhook_settings.token)
+    assert response.status_code == 202
+    assert not callbacks
+
+    YouTubeWebhookDelivery.objects.filter(pk=delivery.pk).update(
+        queued=now() - YouTubeWebhookDelivery.PENDING_GRACE_PERIOD * 2
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        response = _post_webhook(client, event, payload, token=webhook_settings.token)
+    assert response.status_code == 202
+    delivery.refresh_from_db()
+    assert delivery.status == YouTubeWebhookDelivery.Status.APPLIED
+    assert YouTubeLink.objects.get(submission=confirmed_submission)
+
+
+@pytest.mark.django_db
+def test_settings_replay_unmatched_deliveries(orga_client, event, unmatched_delivery):
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    response = orga_client.get(url)
+    assert response.context["unmatched_deliveries"] == 1
+    response = orga_client.post(url, data={"action": "replay_webhooks"}, follow=True)
+    assert response.status_code == 200
+    unmatched_delivery.refresh_from_db()
+    assert unmatched_delivery.status == YouTubeWebhookDelivery.Status.APPLIED
+    submission = unmatched_delivery.submission
+    assert submission.pk == unmatched_delivery.payload["fahrplan"]["id"]
+    assert YouTubeLink.objects.get(submission=submission).video_id == VALID_VIDEO_ID
+    assert response.context["unmatched_deliveries"] == 0
+
+
+@pytest.mark.django_db
+def test_settings_replay_includes_stale_pending_deliveries(
+    orga_client, event, unmatched_delivery, confirmed_submission
+):
+    stale = YouTubeWebhookDelivery.objects.create(
+        event=event,
+        payload=_payload(event, confirmed_submission),
+        payload_hash="stale",
+        video_id=VALID_VIDEO_ID,
+        queued=now() - YouTubeWebhookDelivery.PENDING_GRACE_PERIOD * 2,
+    )
+    YouTubeWebhookDelivery.objects.create(
+        event=event,
+        payload=_payload(event, confirmed_submission),
+        payload_hash="fresh",
+        video_id=VALID_VIDEO_ID,
+        queued=now(),
+    )
+    url = reverse(SETTINGS_URL_NAME, kwargs={"event": event.slug})
+    assert orga_client.get(url).context["unmatched_deliveries"] == 2
+    with patch(
+        "pretalx_youtube.views.process_deliveries", wraps=process_deliveries
+    ) as process:
+        orga_client.post(url, data={"action": "replay_webhooks"})
+    process.assert_called_once()
+    assert {delivery.pk for delivery in process.call_args.args[1]} == {
+        unmatched_delivery.pk,
+        stale.pk,
+    }
+    stale.refresh_from_db()
+    assert stale.status == YouTubeWebhookDelivery.Status.APPLIED
+
+
 @pytest.mark.django_db
 def test_webhook_youtube_nocookie_url(
     client, event, webhook_settings, confirmed_submission
@@ -936,7 +2399,71 @@ def test_webhook_rejects_youtube_com_without_video_id(
 
 
 @pytest.mark.django_db
-def test_find_submission_slug_wrong_prefix(event, confirmed_submission):
+@pytest.mark.parametrize(
+    "fahrplan",
+    (
+        lambda slot: {"guid": str(slot.uuid).upper()},
+        lambda slot: {"slug": slot.frab_slug},
+        lambda slot: {"id": str(slot.submission.pk)},
+        lambda slot: {"id": slot.submission.code},
+    ),
+)
+def test_match_submissions_uses_index(
+    event, slot, fahrplan, locmem_cache, django_assert_num_queries
+):
+    with scope(event=event):
+        slot.submission.event = event
+        payload = {"fahrplan": fahrplan(slot)}
+        assert match_submissions(event, [payload]) == [slot.submission]
+        with django_assert_num_queries(1):
+            assert match_submissions(event, [payload]) == [slot.submission]
+
+
+@pytest.mark.django_db
+def test_match_submissions_only_loads_guids_when_needed(
+    event, slot, locmem_cache, django_assert_num_queries
+):
+    with scope(event=event):
+        slot.submission.event = event
+        # The id matches first, so the guids are not needed.
+        payload = {"fahrplan": {"id": slot.submission.pk, "guid": str(slot.uuid)}}
+        with django_assert_num_queries(1):
+            assert match_submissions(event, [payload]) == [slot.submission]
+        assert (
+            locmem_cache.get(f"pretalx_youtube:submission_guids_version:{event.pk}")
+            is None
+        )
+
+        # Once the guids are cached, they are looked up along with the ids.
+        guid_payload = {"fahrplan": {"id": 0, "guid": str(slot.uuid)}}
+        assert match_submissions(event, [guid_payload]) == [slot.submission]
+        with django_assert_num_queries(1):
+            assert match_submissions(event, [payload, guid_payload]) == [
+                slot.submission,
+                slot.submission,
+            ]
+
+
+@pytest.mark.django_db
+def test_submission_guids_are_dropped_on_schedule_release(event, slot, locmem_cache):
+    key = f"pretalx_youtube:submission_guids_version:{event.pk}"
+    with scope(event=event):
+        slot.submission.event = event
+        payload = {"fahrplan": {"guid": str(slot.uuid)}}
+        assert match_submissions(event, [payload]) == [slot.submission]
+        version = locmem_cache.get(key)
+        assert (
+            locmem_cache.get(
+                f"pretalx_youtube:submission_guid:{event.pk}:{version}:{slot.uuid}"
+            )
+            == slot.submission.pk
+        )
+        schedule_release.send_robust(event, schedule=event.current_schedule, user=None)
+    assert locmem_cache.get(key) is None
+
+
+@pytest.mark.django_db
+def test_match_submissions_slug_wrong_prefix(event, confirmed_submission):
     with scope(event=event):
         payload = {
             "fahrplan": {
@@ -945,11 +2472,11 @@ def test_find_submission_slug_wrong_prefix(event, confirmed_submission):
                 "slug": "other-event-42-foo",
             }
         }
-        assert _find_submission(event, payload) is None
+        assert match_submissions(event, [payload]) == [None]
 
 
 @pytest.mark.django_db
-def test_find_submission_slug_non_numeric_pk(event, confirmed_submission):
+def test_match_submissions_slug_non_numeric_pk(event, confirmed_submission):
     with scope(event=event):
         payload = {
             "fahrplan": {
@@ -958,4 +2485,199 @@ def test_find_submission_slug_non_numeric_pk(event, confirmed_submission):
                 "slug": f"{event.slug}-notanumber-foo",
             }
         }
-        assert _find_submission(event, payload) is None
+        assert match_submissions(event, [payload]) == [None]
+
+
+# -- Recording manifest tests --
+
+MANIFEST_URL_NAME = "plugins:pretalx_youtube:manifest"
+
+
+def _get_manifest(client, event, **kwargs):
+    response = client.get(reverse(MANIFEST_URL_NAME, kwargs={"event": event.slug}))
+    assert response.status_code == 302
+    return client.get(response["Location"], **kwargs)
+
+
+@pytest.mark.django_db
+def test_manifest_lists_scheduled_recordings(
+    client, event, slot, youtube_link, make_slots
+):
+    make_slots(1)
+    response = _get_manifest(client, event)
+    assert response.status_code == 200
+    assert response.json() == {
+        slot.submission.code: {
+            "video_id": "dQw4w9WgXcQ",
+            "embed_url": youtube_link.player_link,
+            "watch_url": youtube_link.youtube_link,
+        }
+    }
+
+
+@pytest.mark.django_db
+def test_manifest_is_served_under_its_digest(client, event, slot, youtube_link):
+    url = reverse(MANIFEST_URL_NAME, kwargs={"event": event.slug})
+    response = client.get(url)
+    assert response["Cache-Control"] == "public, max-age=60"
+    location = response["Location"]
+
+    response = client.get(location)
+    assert response["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert client.get(location, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == 304
+
+    stale = reverse(
+        "plugins:pretalx_youtube:manifest_hashed",
+        kwargs={"event": event.slug, "digest": "0" * 16},
+    )
+    response = client.get(stale)
+    assert response.status_code == 302
+    assert response["Location"] == location
+
+
+@pytest.mark.django_db
+def test_manifest_changes_with_links(client, event, slot, youtube_link, locmem_cache):
+    url = reverse(MANIFEST_URL_NAME, kwargs={"event": event.slug})
+    location = client.get(url)["Location"]
+    youtube_link.video_id = "AAAAAAAAAAA"
+    youtube_link.save()
+    response = _get_manifest(client, event)
+    assert response.request["PATH_INFO"] != location
+    assert response.json()[slot.submission.code]["video_id"] == "AAAAAAAAAAA"
+
+    with scope(event=event):
+        import_links(
+            event,
+            [(1, {"submission": slot.submission.code, "video_id": "BBBBBBBBBBB"})],
+        )
+    response = _get_manifest(client, event)
+    assert response.json()[slot.submission.code]["video_id"] == "BBBBBBBBBBB"
+
+
+@pytest.mark.django_db
+def test_manifest_is_dropped_on_schedule_release(client, event, slot, locmem_cache):
+    assert _get_manifest(client, event).json() == {}
+    YouTubeLink.objects.filter(submission=slot.submission).delete()
+    YouTubeLink.objects.bulk_create(
+        [YouTubeLink(submission=slot.submission, event=event, video_id="dQw4w9WgXcQ")]
+    )
+    assert _get_manifest(client, event).json() == {}
+    with scope(event=event):
+        schedule_release.send_robust(event, schedule=event.current_schedule, user=None)
+    assert list(_get_manifest(client, event).json()) == [slot.submission.code]
+
+
+@pytest.mark.django_db
+def test_manifest_requires_visible_schedule(orga_client, event, slot):
+    event.is_public = False
+    event.save()
+    url = reverse(MANIFEST_URL_NAME, kwargs={"event": event.slug})
+    assert Client().get(url).status_code == 404
+
+    response = orga_client.get(url)
+    assert response["Cache-Control"] == "private, max-age=60"
+    response = orga_client.get(response["Location"])
+    assert response.status_code == 200
+    assert response["Cache-Control"] == "private, max-age=31536000, immutable"
+
+
+# -- Instrumentation tests --
+
+
+@pytest.fixture
+def instrumentation(settings):
+    settings.PLUGIN_SETTINGS = {"pretalx_youtube": {"instrumentation": "on"}}
+
+
+def _instrumentation_records(caplog):
+    return [
+        record
+        for record in caplog.records
+        if record.name == "pretalx_youtube.instrumentation"
+    ]
+
+
+@pytest.mark.django_db
+def test_instrumentation_off_by_default(api_client, event, youtube_link, caplog):
+    caplog.set_level(logging.INFO)
+    with patch("pretalx_youtube.instrumentation.Measurement") as measurement:
+        response = api_client.get(f"/api/events/{event.slug}/p/youtube/")
+    assert response.status_code == 200
+    measurement.assert_not_called()
+    assert not _instrumentation_records(caplog)
+
+
+@pytest.mark.django_db
+def test_instrumentation_logs_api_list(
+    api_client, event, youtube_link, instrumentation, caplog
+):
+    caplog.set_level(logging.INFO)
+    response = api_client.get(f"/api/events/{event.slug}/p/youtube/")
+    assert response.status_code == 200
+    (record,) = _instrumentation_records(caplog)
+    assert record.entry_point == "api"
+    assert record.rows == 1
+    assert record.db_queries > 0
+    assert record.duration_ms >= record.db_duration_ms > 0
+
+
+@pytest.mark.django_db
+def test_instrumentation_logs_webhook(
+    client, event, webhook_settings, confirmed_submission, instrumentation, caplog
+):
+    caplog.set_level(logging.INFO)
+    response = _post_webhook(
+        client,
+        event,
+        _payload(event, confirmed_submission),
+        token=webhook_settings.token,
+    )
+    assert response.status_code == 204
+    (record,) = _instrumentation_records(caplog)
+    assert record.entry_point == "webhook"
+    assert record.rows == 1
+
+
+@pytest.mark.django_db
+def test_instrumentation_logs_recordings(
+    event, youtube_link, confirmed_submission, instrumentation, caplog
+):
+    caplog.set_level(logging.INFO)
+    provider = YouTubeProvider(event)
+    assert provider.get_recording(confirmed_submission)
+    assert provider.get_recordings([confirmed_submission])
+    assert [
+        (record.entry_point, record.rows) for record in _instrumentation_records(caplog)
+    ] == [("recording", 1), ("recording", 1)]
+
+
+@pytest.mark.django_db
+def test_instrumentation_records_prometheus_metrics(
+    api_client, event, youtube_link, settings
+):
+    prometheus_client = pytest.importorskip("prometheus_client")
+    settings.PLUGIN_SETTINGS = {
+        "pretalx_youtube": {"instrumentation": "on", "prometheus": "on"}
+    }
+    labels = {"entry_point": "api"}
+    before = prometheus_client.REGISTRY.get_sample_value(
+        "pretalx_youtube_rows_total", labels
+    )
+    api_client.get(f"/api/events/{event.slug}/p/youtube/")
+    after = prometheus_client.REGISTRY.get_sample_value(
+        "pretalx_youtube_rows_total", labels
+    )
+    assert after == (before or 0) + 1
+
+
+def test_instrumentation_without_prometheus_client(settings, monkeypatch, caplog):
+    monkeypatch.setitem(sys.modules, "prometheus_client", None)
+    get_metrics.cache_clear()
+    try:
+        settings.PLUGIN_SETTINGS = {
+            "pretalx_youtube": {"instrumentation": "on", "prometheus": "on"}
+        }
+        assert get_config() == (True, None)
+        assert "prometheus_client is not installed" in caplog.text
+    finally:
+        get_metrics.cache_clear()